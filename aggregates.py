@@ -0,0 +1,173 @@
+# Import required libraries
+import json
+import os
+import itertools
+import threading
+import numpy as np
+import pandas as pd
+import data_store
+import metrics
+
+DEPOSITED = 'Deposited (USD million current)'
+
+# Default points for each NewClimate NDC status (compared lower-cased and stripped);
+# override them with a {status: points} JSON file at data_store.STATUS_POINTS_FILE
+NDC_STATUS_POINTS = {
+    'on track': 1,
+    'likely on track': 0.75,
+    'likely off track': 0.5,
+    'off track': 0.25
+}
+
+# Dataset versions kept per materialized name (the current one plus ?as_of= snapshots)
+MAX_VERSIONS = data_store.MAX_VERSIONS
+
+# name -> {version: value} for the most recently used versions, replaced as one reference
+_materialized = {}
+# name -> {version: tick of its last use}, to evict the least recently used version
+_last_used = {}
+_ticks = itertools.count()
+_materialize_locks = {}
+_locks_lock = threading.Lock()
+
+
+def load_status_points(path=None):
+    """
+    Read the NDC status scoring from a JSON object of {status: points}.
+    Returns NDC_STATUS_POINTS when the file does not exist.
+    """
+    path = path or data_store.STATUS_POINTS_FILE
+    if not os.path.exists(path):
+        return dict(NDC_STATUS_POINTS)
+    with open(path, encoding='utf-8') as f:
+        return {str(status).strip().lower(): float(points) for status, points in json.load(f).items()}
+
+
+def status_points(statuses, points_map=None):
+    """
+    Score a Series of NDC statuses; unknown or missing statuses get 0 points.
+    """
+    points_map = NDC_STATUS_POINTS if points_map is None else points_map
+    return statuses.str.strip().str.lower().map(points_map).fillna(0)
+
+
+def deposited_sums(df, key):
+    """
+    Sum and count of the deposited amounts per `key` value, in key order.
+    Returns a DataFrame indexed by key value with 'sum' and 'count' columns.
+    """
+    grouped = df.groupby(key)[DEPOSITED]
+    return pd.DataFrame({'sum': grouped.sum(), 'count': grouped.size()})
+
+
+def build_ndc_join_index(finance_df, ndc_df, points_map=None, country_totals=None):
+    """
+    Join the NDC status data with the deposited totals by country.
+    `country_totals` (deposited_sums() by Country, as stored with an ingested version)
+    is used instead of summing `finance_df` when it is given.
+    Returns a dict with:
+      'countries'    - one row per NDC row: Country, NDC_Status, Points, the country's
+                       deposited total and its rank by deposited amount (NaN when the
+                       country has no finance rows)
+      'by_deposited' - deposited totals of the overlapping countries, ascending
+      'by_ndc_order' - the same totals in the NDC data's row order
+    Every overlap view is a slice of these frames.
+    """
+    if country_totals is not None:
+        totals = country_totals['sum'].rename(DEPOSITED).rename_axis('Country').reset_index()
+    else:
+        totals = finance_df.groupby('Country', as_index=False)[DEPOSITED].sum()
+    ndc_countries = set(ndc_df['Country'].dropna().unique())
+    overlap = totals[totals['Country'].isin(ndc_countries)]
+    by_deposited = overlap.sort_values(DEPOSITED, ascending=True)
+    first_ndc_row = pd.Series(range(len(ndc_df)), index=ndc_df['Country'].to_numpy()).groupby(level=0).first()
+    ndc_position = overlap['Country'].map(first_ndc_row)
+    by_ndc_order = overlap.iloc[np.argsort(ndc_position.to_numpy(), kind='stable')]
+
+    countries = ndc_df[['Country', 'NDC_Status']].copy()
+    countries['Points'] = status_points(countries['NDC_Status'], points_map)
+    countries[DEPOSITED] = countries['Country'].map(totals.set_index('Country')[DEPOSITED])
+    rank = pd.Series(range(len(by_deposited)), index=by_deposited['Country'].to_numpy())
+    countries['Deposited_Rank'] = countries['Country'].map(rank)
+    return {'countries': countries, 'by_deposited': by_deposited, 'by_ndc_order': by_ndc_order}
+
+
+def ndc_status_points(join_index):
+    """
+    NDC status points per country, sorted by points ascending.
+    Returns a {Country, NDC_Status, Points} DataFrame.
+    """
+    countries = join_index['countries']
+    return countries[['Country', 'NDC_Status', 'Points']].sort_values('Points', ascending=True)
+
+
+def deposited_by_ndc_countries(join_index):
+    """
+    Total deposited by country, only for countries present in the NDC data, sorted ascending.
+    """
+    return join_index['by_deposited']
+
+
+def ndc_status_points_overlap(join_index):
+    """
+    NDC status points for countries present in both datasets, ordered by deposited amount ascending.
+    """
+    countries = join_index['countries']
+    overlap = countries[countries['Deposited_Rank'].notna()]
+    return overlap.sort_values('Deposited_Rank')[['Country', 'NDC_Status', 'Points']]
+
+
+def deposited_overlap_order(join_index):
+    """
+    Total deposited for countries present in both datasets, in the NDC data's row order.
+    """
+    return join_index['by_ndc_order']
+
+
+def materialize(name, version, build):
+    """
+    Return the value materialized under `name` for a dataset version, calling `build()` once per version.
+    Concurrent callers for a new version wait for the first build instead of repeating it.
+    The MAX_VERSIONS most recently used versions are kept.
+    """
+    value = _materialized.get(name, {}).get(version)
+    if value is not None:
+        _last_used.setdefault(name, {})[version] = next(_ticks)
+        metrics.cache_result(name, True)
+        return value
+    metrics.cache_result(name, False)
+    with _locks_lock:
+        lock = _materialize_locks.setdefault(name, threading.Lock())
+    with lock:
+        versions = _materialized.get(name, {})
+        value = versions.get(version)
+        if value is None:
+            with metrics.stage(f'build:{name}'):
+                value = build()
+            # Copy, add and trim, then swap in so readers never see a dict being modified
+            used = _last_used.setdefault(name, {})
+            used[version] = next(_ticks)
+            versions = dict(versions)
+            versions[version] = value
+            while len(versions) > MAX_VERSIONS:
+                oldest = min(versions, key=lambda v: used.get(v, -1))
+                del versions[oldest]
+                used.pop(oldest, None)
+            _materialized[name] = versions
+        return value
+
+
+def is_materialized(name, version):
+    """
+    Check whether `name` is materialized for a dataset version, without building it.
+    """
+    return version in _materialized.get(name, {})
+
+
+def clear():
+    """
+    Drop every materialized value so the next access rebuilds it.
+    """
+    with _locks_lock:
+        _materialized.clear()
+        _last_used.clear()
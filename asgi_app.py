@@ -0,0 +1,94 @@
+# Import required libraries
+import argparse
+import asyncio
+import functools
+import os
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from a2wsgi import WSGIMiddleware
+from fastapi import FastAPI
+import data_store
+import dataset
+import flask_app
+import refresh
+
+# Threads that parse workbooks and build views, off the event loop
+DATA_THREADS = int(os.environ.get('ASGI_DATA_THREADS', '2'))
+# Threads that run the Flask route handlers
+REQUEST_THREADS = int(os.environ.get('ASGI_REQUEST_THREADS', '10'))
+
+_executor = ThreadPoolExecutor(max_workers=DATA_THREADS, thread_name_prefix='data')
+# The in-flight view build per dataset version
+_builds = {}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Run the startup warm-up (API_WARM_UP=1) and start the Data/ watcher (DATA_WATCH_INTERVAL)
+    before uvicorn accepts connections.
+    """
+    await asyncio.get_running_loop().run_in_executor(_executor, refresh.start, dataset.warm_views)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def ensure_views(as_of=None):
+    """
+    Make sure the views a request reads are built before it runs: those of the ingested
+    version picked with ?as_of=, otherwise those of the current dataset version.
+    The build runs in the data thread pool; concurrent requests for the same version
+    await one shared build instead of each starting their own. Whether a version is
+    built is read from aggregates, so views it has evicted are built here again.
+    Raises ValueError when `as_of` matches no ingested version.
+    """
+    if as_of:
+        version = data_store.resolve_as_of(as_of)
+        warm = functools.partial(dataset.warm_views, as_of=version)
+    else:
+        version = dataset.selected_version()
+        warm = dataset.warm_views
+    if dataset.views_ready(version):
+        return
+    build = _builds.get(version)
+    if build is None:
+        build = asyncio.get_running_loop().run_in_executor(_executor, warm)
+        _builds[version] = build
+        build.add_done_callback(lambda _: _builds.pop(version, None))
+    # Shielded so a client disconnect does not cancel the build other requests are waiting on
+    await asyncio.shield(build)
+
+
+@app.middleware('http')
+async def warm_before_api(request, call_next):
+    """
+    Build the dataset views without blocking the event loop before /api requests reach Flask.
+    """
+    if request.url.path.startswith('/api/') and not request.url.path.startswith('/api/_'):
+        try:
+            await ensure_views(request.query_params.get('as_of'))
+        except Exception:
+            # Let the Flask handler report the error in its usual {"error": ...} form
+            pass
+    return await call_next(request)
+
+
+# Every flask_app.py route, served through a thread pool
+app.mount('/', WSGIMiddleware(flask_app.app, workers=REQUEST_THREADS))
+
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description='Serve the API with uvicorn.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', '1')),
+                        help='number of worker processes')
+    args = parser.parse_args()
+    uvicorn.run('asgi_app:app', host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+# Import required libraries
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+import numpy as np
+import pandas as pd
+
+# Run from the repository root so flask_app.py and Data/ resolve
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+SYNTHETIC_DIR = os.path.join(REPO_ROOT, 'benchmarks', '.data')
+
+# Metrics where a higher value is a regression; requests/sec is the reverse
+COST_METRICS = ('cold_ms', 'warm_p50_ms', 'warm_p99_ms', 'peak_rss_mb')
+
+
+def make_synthetic_data(scale, out_dir, seed=0):
+    """
+    Write Pledges / NDC workbooks with `scale` times the rows of the ones in Data/.
+    Copy i > 0 gets suffixed country names (so the number of groups and NDC overlaps
+    grows with the scale), parenthetical contributor suffixes (so cleaning has work
+    to do) and randomly perturbed amounts.
+    """
+    import data_store
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    pledges = data_store.read_sheet(data_store.FINANCE_WORKBOOK, data_store.FINANCE_SHEET)
+    ndc = data_store.read_sheet(data_store.NDC_WORKBOOK)
+    pledge_copies = []
+    ndc_copies = []
+    for i in range(scale):
+        pledge_copy = pledges.copy()
+        ndc_copy = ndc.copy()
+        if i > 0:
+            pledge_copy['Country'] = pledge_copy['Country'] + f' #{i}'
+            pledge_copy['Contributor'] = pledge_copy['Contributor'] + f' (Agency {i})'
+            ndc_copy['Country'] = ndc_copy['Country'] + f' #{i}'
+            for col in ('Pledged (USD million current)', 'Deposited (USD million current)'):
+                pledge_copy[col] = pledge_copy[col] * rng.lognormal(0, 0.5, len(pledge_copy))
+        pledge_copies.append(pledge_copy)
+        ndc_copies.append(ndc_copy)
+    finance_path = os.path.join(out_dir, os.path.basename(data_store.FINANCE_WORKBOOK))
+    with pd.ExcelWriter(finance_path) as writer:
+        pd.concat(pledge_copies, ignore_index=True).to_excel(writer, sheet_name=data_store.FINANCE_SHEET, index=False)
+    pd.concat(ndc_copies, ignore_index=True).to_excel(os.path.join(out_dir, os.path.basename(data_store.NDC_WORKBOOK)), index=False)
+
+
+def api_paths():
+    """
+    Return every parameterless /api route of flask_app, excluding the /api/_ service routes.
+    Routes that need a parameter get one valid in every synthetic dataset (copy 0 keeps
+    the names of Data/).
+    """
+    import data_store
+    import flask_app
+    paths = sorted(
+        rule.rule for rule in flask_app.app.url_map.iter_rules()
+        if rule.rule.startswith('/api/') and not rule.rule.startswith('/api/_') and '<' not in rule.rule
+    )
+    pledges = data_store.read_sheet(data_store.FINANCE_WORKBOOK, data_store.FINANCE_SHEET)
+    query = urllib.parse.urlencode({'group_by': 'Contributor', 'key': pledges['Contributor'].dropna().iloc[0]})
+    return [f'{path}?{query}' if path == '/api/aggregate/entries' else path for path in paths]
+
+
+def percentile_ms(samples, q):
+    """
+    Return the q-th percentile of a list of durations in seconds, in milliseconds.
+    """
+    return float(np.percentile(samples, q) * 1000) if samples else None
+
+
+def measure_endpoints(paths, repeat):
+    """
+    Time each endpoint through the Flask test client.
+    Caches are dropped before the first (cold) request of every endpoint; the
+    following `repeat` requests give the warm latency distribution. Endpoints whose
+    cold request is not a 200 (e.g. the SDG routes without Data/ndc_sdg.csv) are not
+    timed; their status is returned under 'skipped'.
+    """
+    import aggregates
+    import data_store
+    import flask_app
+    client = flask_app.app.test_client()
+    results = {}
+    skipped = {}
+    for path in paths:
+        data_store.clear()
+        aggregates.clear()
+        start = time.perf_counter()
+        response = client.get(path)
+        cold = time.perf_counter() - start
+        if response.status_code != 200:
+            skipped[path] = response.status_code
+            continue
+        warm = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            client.get(path).get_data()
+            warm.append(time.perf_counter() - start)
+        results[path] = {
+            'bytes': len(response.get_data()),
+            'cold_ms': cold * 1000,
+            'warm_p50_ms': percentile_ms(warm, 50),
+            'warm_p99_ms': percentile_ms(warm, 99),
+        }
+    return results, skipped
+
+
+def load_test(base_url, paths, concurrency, duration):
+    """
+    Hit each path from `concurrency` threads for `duration` seconds over HTTP.
+    Returns {path: {'rps': ..., 'errors': ...}}.
+    """
+    results = {}
+    for path in paths:
+        counts = [0] * concurrency
+        errors = [0] * concurrency
+        deadline = time.perf_counter() + duration
+
+        def worker(slot):
+            while time.perf_counter() < deadline:
+                try:
+                    with urllib.request.urlopen(base_url + path) as response:
+                        response.read()
+                    counts[slot] += 1
+                except Exception:
+                    errors[slot] += 1
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results[path] = {'rps': sum(counts) / duration, 'errors': sum(errors)}
+    return results
+
+
+def serve_in_background():
+    """
+    Start flask_app on a local threaded werkzeug server and return its base URL.
+    """
+    from werkzeug.serving import make_server
+    import flask_app
+    server = make_server('127.0.0.1', 0, flask_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def run_worker(options):
+    """
+    Measure one endpoint on one dataset in this process (run with NDC_DATA_DIR pointing
+    at it), so the peak RSS is that of serving this endpoint alone.
+    """
+    if options.get('snapshot'):
+        import ingest
+        ingest.build_snapshot(if_stale=True)
+    path = options['path']
+    results, skipped = measure_endpoints([path], options['repeat'])
+    if results and options['duration'] > 0:
+        base_url = serve_in_background()
+        results[path].update(load_test(base_url, [path], options['concurrency'], options['duration'])[path])
+    if results:
+        results[path]['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {'endpoints': results, 'skipped': skipped}
+
+
+def run_scale(scale, options):
+    """
+    Generate (or reuse) the synthetic data for a scale and measure each endpoint on it
+    in a fresh process.
+    """
+    data_dir = os.path.join(SYNTHETIC_DIR, f'scale-{scale}')
+    if not os.path.exists(os.path.join(data_dir, 'NewClimateNDCCompData.xlsx')):
+        print(f'Generating {scale}x synthetic workbooks in {data_dir}', file=sys.stderr)
+        make_synthetic_data(scale, data_dir)
+    env = dict(os.environ, NDC_DATA_DIR=data_dir)
+    results = {'endpoints': {}, 'skipped': {}}
+    for path in options['paths'] or api_paths():
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', json.dumps(dict(options, path=path))],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+        worker = json.loads(completed.stdout.strip().splitlines()[-1])
+        results['endpoints'].update(worker['endpoints'])
+        results['skipped'].update(worker['skipped'])
+    return results
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Compare results with a stored baseline.
+    Latencies more than `tolerance` (a fraction) above the baseline, or throughput
+    more than `tolerance` below it, are reported as regressions.
+    """
+    regressions = []
+    for scale, scale_results in results.items():
+        base_endpoints = baseline.get(scale, {}).get('endpoints', {})
+        for path, metrics in scale_results['endpoints'].items():
+            base = base_endpoints.get(path)
+            if not base:
+                continue
+            for metric in COST_METRICS:
+                if metrics.get(metric) and base.get(metric) and metrics[metric] > base[metric] * (1 + tolerance):
+                    regressions.append(f'{scale}x {path} {metric}: {base[metric]:.2f} -> {metrics[metric]:.2f}')
+            if metrics.get('rps') and base.get('rps') and metrics['rps'] < base['rps'] * (1 - tolerance):
+                regressions.append(f"{scale}x {path} rps: {base['rps']:.1f} -> {metrics['rps']:.1f}")
+    return regressions
+
+
+def print_report(results):
+    """
+    Print one table per scale, followed by the endpoints that were not measured.
+    """
+    for scale, scale_results in results.items():
+        print(f"\n== {scale}x")
+        print(f"{'endpoint':<58}{'bytes':>11}{'cold ms':>10}{'p50 ms':>9}{'p99 ms':>9}{'req/s':>9}{'RSS MB':>9}")
+        for path, m in scale_results['endpoints'].items():
+            rps = f"{m['rps']:.0f}" if 'rps' in m else '-'
+            print(f"{path:<58}{m['bytes']:>11}{m['cold_ms']:>10.2f}"
+                  f"{m['warm_p50_ms']:>9.2f}{m['warm_p99_ms']:>9.2f}{rps:>9}{m['peak_rss_mb']:>9.0f}")
+        for path, status in scale_results['skipped'].items():
+            print(f"{path:<58} skipped: status {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the /api endpoints on synthetic data.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100], help='row-count multipliers')
+    parser.add_argument('--paths', nargs='+', help='endpoints to measure (default: every /api route)')
+    parser.add_argument('--repeat', type=int, default=30, help='warm requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='load generator threads')
+    parser.add_argument('--duration', type=float, default=2.0, help='load test seconds per endpoint (0 to skip)')
+    parser.add_argument('--snapshot', action='store_true', help='build the columnar snapshot before measuring')
+    parser.add_argument('--url', help='only load-test an already running server (e.g. website/main.py)')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--save-baseline', help='store the results as the new baseline')
+    parser.add_argument('--compare', help='baseline JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown fraction')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return
+
+    if args.url:
+        paths = args.paths or ['/api/contributors']
+        for path, m in load_test(args.url.rstrip('/'), paths, args.concurrency, args.duration or 2.0).items():
+            print(f"{path:<58}{m['rps']:>9.0f} req/s{m['errors']:>6} errors")
+        return
+
+    options = {
+        'paths': args.paths,
+        'repeat': args.repeat,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'snapshot': args.snapshot,
+    }
+    results = {str(scale): run_scale(scale, options) for scale in args.scales}
+    print_report(results)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            print('\nRegressions against ' + args.compare + ':')
+            for line in regressions:
+                print('  ' + line)
+            sys.exit(1)
+        print('\nNo regressions against ' + args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+# Import required libraries
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+import metrics
+
+# pyarrow is optional; without it every load falls back to the Excel files,
+# and there is no snapshot or version history
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = feather = None
+
+# Location of the source workbooks (override with NDC_DATA_DIR)
+DATA_DIR = os.environ.get('NDC_DATA_DIR', 'Data')
+FINANCE_WORKBOOK = os.path.join(DATA_DIR, 'CFU-Website-MASTER-Update-for-2025.xlsx')
+FINANCE_SHEET = 'Pledges'
+NDC_WORKBOOK = os.path.join(DATA_DIR, 'NewClimateNDCCompData.xlsx')
+
+# Sheets compiled into the columnar snapshot by ingest.py
+SOURCES = [
+    (FINANCE_WORKBOOK, FINANCE_SHEET),
+    (NDC_WORKBOOK, 0),
+]
+SNAPSHOT_DIR = os.path.join(DATA_DIR, 'snapshot')
+
+# Optional configuration files; editing them changes the dataset version too
+ALIASES_FILE = os.path.join(DATA_DIR, 'name_aliases.csv')
+STATUS_POINTS_FILE = os.path.join(DATA_DIR, 'ndc_status_points.json')
+CONFIG_FILES = [ALIASES_FILE, STATUS_POINTS_FILE]
+# WRI NDC-SDG linkages (described in Data/sources.csv); optional, indexed by sdg_index.py
+SDG_LINKAGES_FILE = os.path.join(DATA_DIR, 'ndc_sdg.csv')
+# Files that may be absent but change the dataset version when present
+OPTIONAL_FILES = CONFIG_FILES + [SDG_LINKAGES_FILE]
+MANIFEST_NAME = 'manifest.json'
+# Ingested versions are kept under <snapshot>/versions/<version>/ and listed in the history
+HISTORY_NAME = 'history.json'
+VERSIONS_DIR = 'versions'
+# Deposited totals by group column stored with each ingested version
+TOTALS_NAME = 'totals.arrow'
+
+# Ingested versions whose tables are kept in memory (the served one plus recent ?as_of= versions)
+MAX_VERSIONS = 4
+
+# Parsed frames keyed by (path, sheet), each stored with the file signature it was read from
+_frames = {}
+# Tables of ingested versions: version directory -> {table key: frame}, least recently used first
+_version_frames = OrderedDict()
+_frames_lock = threading.Lock()
+_load_locks = {}
+
+
+def file_signature(path):
+    """
+    Return a cheap fingerprint of a file on disk.
+    The (mtime, size) pair changes whenever a workbook is replaced.
+    """
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def read_sheet(path, sheet_name=0):
+    """
+    Parse one sheet of an Excel workbook.
+    Returns a pandas DataFrame with cleaned column names.
+    """
+    df = pd.read_excel(path, sheet_name=sheet_name)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def file_sha256(path):
+    """
+    Return the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def aliases_sha256():
+    """
+    Return the SHA-256 of ALIASES_FILE, or None when there is no alias table.
+    """
+    return file_sha256(ALIASES_FILE) if os.path.exists(ALIASES_FILE) else None
+
+
+def table_name(path, sheet_name=0):
+    """
+    Return the snapshot table name for a workbook sheet.
+    Example: ('Data/Book.xlsx', 'Pledges') -> 'Book__Pledges'
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f'{stem}__{sheet_name}'
+
+
+def read_manifest(snapshot_dir=None):
+    """
+    Read the snapshot manifest, or return None when no snapshot has been built.
+    """
+    manifest_path = os.path.join(snapshot_dir or SNAPSHOT_DIR, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def manifest_is_current(manifest, sources=None):
+    """
+    Check whether a manifest records a version built from the current source files.
+    """
+    return manifest is not None and 'version' in manifest and all(
+        os.path.basename(path) in manifest['sources']
+        and source_is_current(path, manifest['sources'][os.path.basename(path)])
+        for path, _ in (sources or SOURCES)
+    )
+
+
+def source_is_current(path, recorded):
+    """
+    Check whether a source file still matches its manifest entry.
+    Compares (mtime, size) first and only hashes the file when those differ.
+    """
+    stat = os.stat(path)
+    if stat.st_size != recorded.get('size'):
+        return False
+    if stat.st_mtime_ns == recorded.get('mtime_ns'):
+        return True
+    return file_sha256(path) == recorded.get('sha256')
+
+
+def read_snapshot(path, sheet_name=0, snapshot_dir=None):
+    """
+    Load a sheet from the columnar snapshot, memory-mapping the Arrow file.
+    Returns None when pyarrow is missing or the snapshot is absent or stale.
+    """
+    if feather is None:
+        return None
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        return None
+    table = manifest.get('tables', {}).get(table_name(path, sheet_name))
+    recorded = manifest.get('sources', {}).get(os.path.basename(path))
+    if table is None or recorded is None or not source_is_current(path, recorded):
+        return None
+    try:
+        return feather.read_table(os.path.join(snapshot_dir, table['file']), memory_map=True).to_pandas()
+    except (OSError, ValueError):
+        return None
+
+
+def load_sheet(path, sheet_name=0):
+    """
+    Load a sheet from the snapshot when it is current, otherwise from the workbook.
+    """
+    with metrics.stage('read_snapshot'):
+        df = read_snapshot(path, sheet_name)
+    if df is None:
+        with metrics.stage('read_excel'):
+            df = read_sheet(path, sheet_name)
+    metrics.count('rows_loaded_total', len(df))
+    return df
+
+
+def version_dir(version, snapshot_dir=None):
+    """
+    Return the directory holding the tables of an ingested version.
+    """
+    return os.path.join(snapshot_dir or SNAPSHOT_DIR, VERSIONS_DIR, version)
+
+
+def read_history(snapshot_dir=None):
+    """
+    Return the list of ingested versions, oldest first (empty when there is none).
+    """
+    history_path = os.path.join(snapshot_dir or SNAPSHOT_DIR, HISTORY_NAME)
+    try:
+        with open(history_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def resolve_as_of(as_of, snapshot_dir=None):
+    """
+    Resolve an ?as_of= value to an ingested version.
+    Accepts a version name or an ISO date/time, which selects the latest version
+    ingested at or before it (a bare date means the end of that day, UTC).
+    Raises ValueError when nothing matches or pyarrow is not installed.
+    """
+    if feather is None:
+        raise ValueError("as_of needs pyarrow to read the ingested versions")
+    history = read_history(snapshot_dir)
+    for entry in history:
+        if entry['version'] == as_of:
+            return entry['version']
+    try:
+        moment = pd.Timestamp(as_of)
+    except ValueError:
+        raise ValueError(f"Unknown version: {as_of}")
+    if moment.tzinfo is None:
+        moment = moment.tz_localize('UTC')
+    if len(as_of) <= 10:
+        moment = moment + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    matching = [entry for entry in history if pd.Timestamp(entry['created']) <= moment]
+    if not matching:
+        raise ValueError(f"No version ingested at or before {as_of}")
+    return matching[-1]['version']
+
+
+def read_version_totals(version, snapshot_dir=None):
+    """
+    Return the deposited totals stored with an ingested version, as a dict mapping each
+    group column to a DataFrame indexed by name (in key order) with 'sum' and 'count'.
+    The *_clean totals are left out when the alias table changed since the version was
+    ingested. Returns an empty dict for versions ingested without totals.
+    """
+    path = os.path.join(version_dir(version, snapshot_dir), TOTALS_NAME)
+    if feather is None or not os.path.exists(path):
+        return {}
+    entry = next((entry for entry in read_history(snapshot_dir) if entry['version'] == version), {})
+    aliases_current = entry.get('aliases', False) == aliases_sha256()
+    table = feather.read_table(path).to_pandas()
+    return {
+        key: rows.set_index('name')[['sum', 'count']].rename_axis(key)
+        for key, rows in table.groupby('group_by', sort=False)
+        if aliases_current or not key.endswith('_clean')
+    }
+
+
+def get_version_frame(version, path, sheet_name=0, snapshot_dir=None):
+    """
+    Return a sheet as it was in an ingested version, memory-mapped from its Arrow file.
+    Versions never change, so each one is read once; the tables of the MAX_VERSIONS most
+    recently used versions are kept. Raises RuntimeError without pyarrow.
+    """
+    if feather is None:
+        raise RuntimeError("Reading ingested versions requires pyarrow")
+    directory = os.path.abspath(version_dir(version, snapshot_dir))
+    key = ('version', os.path.join(directory, table_name(path, sheet_name) + '.arrow'))
+    df = _cached_version_frame(directory, key)
+    if df is not None:
+        metrics.cache_result('frame', True)
+        return df
+    metrics.cache_result('frame', False)
+    with _load_lock(key):
+        df = _cached_version_frame(directory, key)
+        if df is None:
+            with metrics.stage('read_snapshot'):
+                df = feather.read_table(key[1], memory_map=True).to_pandas()
+            with _frames_lock:
+                _version_frames.setdefault(directory, {})[key] = df
+                _version_frames.move_to_end(directory)
+                while len(_version_frames) > MAX_VERSIONS:
+                    _, evicted = _version_frames.popitem(last=False)
+                    for evicted_key in evicted:
+                        _load_locks.pop(evicted_key, None)
+        return df
+
+
+def _cached_version_frame(directory, key):
+    """
+    Return a version's table if it is in memory, marking the version as recently used.
+    """
+    with _frames_lock:
+        tables = _version_frames.get(directory)
+        if tables is None:
+            return None
+        _version_frames.move_to_end(directory)
+        return tables.get(key)
+
+
+def _load_lock(key):
+    """
+    Return the lock guarding the parse of a single (path, sheet) entry.
+    """
+    with _frames_lock:
+        if key not in _load_locks:
+            _load_locks[key] = threading.Lock()
+        return _load_locks[key]
+
+
+def get_frame(path, sheet_name=0):
+    """
+    Return the parsed sheet, reading the workbook only when it changed on disk.
+    The returned DataFrame is shared between requests and must not be modified.
+    """
+    key = (os.path.abspath(path), sheet_name)
+    signature = file_signature(path)
+    entry = _frames.get(key)
+    if entry is not None and entry[0] == signature:
+        metrics.cache_result('frame', True)
+        return entry[1]
+    metrics.cache_result('frame', False)
+    # Only one thread parses a given sheet; the others wait and reuse its result
+    with _load_lock(key):
+        entry = _frames.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        df = load_sheet(path, sheet_name)
+        _frames[key] = (signature, df)
+        return df
+
+
+def last_modified(sources=None):
+    """
+    Return the newest modification time, as a Unix timestamp, of the files that make up
+    the dataset version: the source workbooks and whichever optional files exist.
+    """
+    paths = {path for path, _ in (sources or SOURCES)}
+    paths.update(path for path in OPTIONAL_FILES if os.path.exists(path))
+    return max(os.stat(path).st_mtime for path in paths)
+
+
+def dataset_version(sources=None):
+    """
+    Return a short token identifying the current contents of the source files.
+    It changes whenever any source workbook, configuration file or the SDG
+    linkage file is replaced on disk.
+    """
+    paths = sorted({path for path, _ in (sources or SOURCES)})
+    parts = []
+    for path in paths:
+        mtime_ns, size = file_signature(path)
+        parts.append(f'{os.path.basename(path)}:{mtime_ns}:{size}')
+    for path in OPTIONAL_FILES:
+        if os.path.exists(path):
+            mtime_ns, size = file_signature(path)
+            parts.append(f'{os.path.basename(path)}:{mtime_ns}:{size}')
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:16]
+
+
+def clear():
+    """
+    Drop every cached frame so the next access re-reads from disk.
+    """
+    with _frames_lock:
+        _frames.clear()
+        _version_frames.clear()
@@ -0,0 +1,263 @@
+# Import required libraries
+import os
+import pandas as pd
+import aggregates
+import data_store
+import group_index
+import json_encoding
+import normalize
+import refresh
+import row_index
+import sdg_index
+
+# The versioned data layer shared by flask_app.py, website/main.py and streamlit_app.py:
+# the frames of the dataset version being served (or of an ingested ?as_of= version)
+# and every view materialized from them. Nothing here depends on a web framework.
+
+# The fixed grouping routes, as /api/aggregate parameters
+GROUP_VIEWS = {
+    'by_contributor': {'group_by': 'Contributor'},
+    'by_contributor_math': {'group_by': 'Contributor', 'detail': '1', 'sort': 'key'},
+    'by_contributor_clean': {'group_by': 'Contributor', 'normalize': '1'},
+    'by_contributor_clean_math': {'group_by': 'Contributor', 'normalize': '1', 'detail': '1', 'sort': 'key'},
+    'by_country': {'group_by': 'Country'},
+    'by_country_math': {'group_by': 'Country', 'detail': '1', 'sort': 'key'},
+    'by_country_clean': {'group_by': 'Country', 'normalize': '1'},
+    'by_country_clean_math': {'group_by': 'Country', 'normalize': '1', 'detail': '1', 'sort': 'key'},
+}
+
+
+# Materialized names built by warm_views(), directly or through the views they are built from
+WARM_VIEWS = ('pledge_index', 'dashboard_bodies', 'frame_views', 'ndc_join_index', 'group_views', 'totals')
+
+
+def served_snapshot(as_of=None):
+    """
+    Return the (ingested version, dataset version) to read: the ingested version `as_of`
+    (a resolved ?as_of= value), or the one published by the refresh worker. None means
+    the files in Data/ are read directly.
+    """
+    if as_of:
+        return as_of, as_of
+    return refresh.serving()
+
+
+def selected_version(as_of=None):
+    """
+    Return the dataset version to work on: `as_of`, or the one being served.
+    """
+    return as_of or refresh.current_version()
+
+
+def load_data(as_of=None):
+    """
+    Load and preprocess the financial data from Excel file.
+    Returns a pandas DataFrame with cleaned column names.
+    The workbook is parsed once and re-read only when the file changes; the frame is
+    shared by every view built from it and must not be modified.
+    """
+    served = served_snapshot(as_of)
+    if served:
+        return data_store.get_version_frame(served[0], data_store.FINANCE_WORKBOOK, data_store.FINANCE_SHEET)
+    return data_store.get_frame(data_store.FINANCE_WORKBOOK, data_store.FINANCE_SHEET)
+
+
+def load_ndc_data(as_of=None):
+    """
+    Load the NewClimate NDC status data from Excel file.
+    Returns a pandas DataFrame, cached and shared like load_data().
+    """
+    served = served_snapshot(as_of)
+    if served:
+        return data_store.get_version_frame(served[0], data_store.NDC_WORKBOOK)
+    return data_store.get_frame(data_store.NDC_WORKBOOK)
+
+
+def pledge_index(as_of=None):
+    """
+    Return the filter/sort index over the pledge rows for the current dataset version.
+    """
+    return aggregates.materialize(
+        'pledge_index', selected_version(as_of), lambda: row_index.build_row_index(load_data(as_of))
+    )
+
+
+def _build_group_index(as_of=None):
+    """
+    Build the group index over a copy of the pledge rows with the cleaned name columns added.
+    """
+    df = load_data(as_of).copy()
+    aliases = normalize.load_aliases()
+    df['Contributor_clean'] = normalize.normalize_names(df['Contributor'], aliases)
+    df['Country_clean'] = normalize.normalize_names(df['Country'], aliases)
+    return group_index.build_group_index(df)
+
+
+def pledge_groups(as_of=None):
+    """
+    Return the per-key group index used by /api/aggregate for the current dataset version.
+    """
+    return aggregates.materialize('group_index', selected_version(as_of), lambda: _build_group_index(as_of))
+
+
+def version_totals(as_of=None):
+    """
+    Return the deposited totals by group column stored with the served ingested version
+    (see data_store.read_version_totals); empty when the files in Data/ are read directly.
+    """
+    served = served_snapshot(as_of)
+    return aggregates.materialize(
+        'totals', selected_version(as_of),
+        lambda: data_store.read_version_totals(served[0]) if served else {},
+    )
+
+
+def _build_group_views(as_of=None):
+    """
+    Answer the by_contributor / by_country aliases of /api/aggregate and serialize each one to JSON bytes.
+    They are read off the stored totals when the version has them, and off the group index otherwise.
+    """
+    totals = version_totals(as_of)
+    views = {}
+    for name, args in GROUP_VIEWS.items():
+        key = args['group_by'] + ('_clean' if args.get('normalize') == '1' else '')
+        if key in totals:
+            records = group_index.aggregate_totals(totals[key], key, args.get('sort', 'value'),
+                                                   args.get('detail') == '1')
+        else:
+            index = pledge_groups(as_of)
+            records = group_index.aggregate(index, group_index.parse_query(index, args))
+        views[name] = json_encoding.dumps(records)
+    return views
+
+
+def materialized_views(as_of=None):
+    """
+    Return the prebuilt JSON bodies for the current dataset version.
+    They are computed on the first request after the data changes and reused until then.
+    """
+    return aggregates.materialize('group_views', selected_version(as_of), lambda: _build_group_views(as_of))
+
+
+def ndc_join_index(as_of=None):
+    """
+    Return the country-keyed NDC / deposited join for the current dataset version.
+    """
+    return aggregates.materialize(
+        'ndc_join_index', selected_version(as_of),
+        lambda: aggregates.build_ndc_join_index(load_data(as_of), load_ndc_data(as_of), aggregates.load_status_points(),
+                                                version_totals(as_of).get('Country')),
+    )
+
+
+def _build_frame_views(as_of=None):
+    """
+    Compute the DataFrame-shaped views from one read of both workbooks.
+    """
+    finance_df = load_data(as_of)
+    ndc_df = load_ndc_data(as_of)
+    join_index = ndc_join_index(as_of)
+    return {
+        'raw_data': finance_df,
+        'deposited_column': finance_df[[aggregates.DEPOSITED]],
+        'ndc_status_table': ndc_df,
+        'ndc_status_points_chart': aggregates.ndc_status_points(join_index),
+        'deposited_by_ndc_status_countries': aggregates.deposited_by_ndc_countries(join_index),
+        'ndc_status_points_chart_overlap': aggregates.ndc_status_points_overlap(join_index),
+        'deposited_by_ndc_status_countries_overlap_order': aggregates.deposited_overlap_order(join_index),
+    }
+
+
+def frame_views(as_of=None):
+    """
+    Return the DataFrame-shaped views for the current dataset version.
+    """
+    return aggregates.materialize('frame_views', selected_version(as_of), lambda: _build_frame_views(as_of))
+
+
+def _build_dashboard_bodies(as_of=None):
+    """
+    Serialize every versioned view to JSON bytes for /api/dashboard.
+    """
+    bodies = {name: json_encoding.frame_to_json(df) for name, df in frame_views(as_of).items()}
+    bodies.update(materialized_views(as_of))
+    return bodies
+
+
+def dashboard_bodies(as_of=None):
+    """
+    Return the JSON bodies of all versioned views, built in one pass per dataset version.
+    """
+    return aggregates.materialize('dashboard_bodies', selected_version(as_of), lambda: _build_dashboard_bodies(as_of))
+
+
+def sdg_signature():
+    """
+    Return the signature of ndc_sdg.csv, which versions everything derived from it.
+    Raises FileNotFoundError, with where to get the file, when it is missing.
+    """
+    path = data_store.SDG_LINKAGES_FILE
+    if not os.path.exists(path):
+        sdg_index.validate_schema(path)
+    return data_store.file_signature(path)
+
+
+def sdg_linkages():
+    """
+    Return the country -> SDG index of ndc_sdg.csv, streamed once per version of that file.
+    Raises FileNotFoundError when the file is missing and ValueError when its columns are not recognized.
+    """
+    return aggregates.materialize(
+        'sdg_index', sdg_signature(), lambda: sdg_index.build_sdg_index(data_store.SDG_LINKAGES_FILE)
+    )
+
+
+def sdg_counts():
+    """
+    Count the SDGs linked to each country in ndc_sdg.csv.
+    Returns a {Country, SDG_Count} DataFrame sorted ascending.
+    """
+    return sdg_index.sdg_counts(sdg_linkages())
+
+
+def sdg_counts_body():
+    """
+    Return the JSON body of sdg_counts() for /api/dashboard, serialized once per version of ndc_sdg.csv.
+    """
+    return aggregates.materialize(
+        'sdg_counts_body', sdg_signature(), lambda: json_encoding.frame_to_json(sdg_counts())
+    )
+
+
+def country_deposited_totals(as_of=None):
+    """
+    Return the deposited totals indexed by cleaned country name.
+    """
+    totals = version_totals(as_of).get('Country_clean')
+    if totals is not None:
+        return totals['sum'].rename(aggregates.DEPOSITED)
+    index = pledge_groups(as_of)
+    query = group_index.parse_query(index, {'group_by': 'Country', 'normalize': '1', 'sort': 'key'})
+    totals = pd.DataFrame(group_index.aggregate(index, query))
+    return totals.set_index('Country_clean')[aggregates.DEPOSITED]
+
+
+def warm_views(as_of=None):
+    """
+    Build every materialized view for the current dataset version, or for the
+    ingested version `as_of` (a resolved ?as_of= value).
+    Returns the dataset version the views were built for.
+    """
+    version = selected_version(as_of)
+    pledge_index(as_of)
+    dashboard_bodies(as_of)
+    if os.path.exists(data_store.SDG_LINKAGES_FILE):
+        sdg_counts_body()
+    return version
+
+
+def views_ready(version):
+    """
+    Check whether every view warm_views() builds is materialized for a dataset version.
+    """
+    return all(aggregates.is_materialized(name, version) for name in WARM_VIEWS)
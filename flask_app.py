@@ -1,50 +1,176 @@
 # Import required libraries
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, Response, g, jsonify, request, send_from_directory
 from flask_cors import CORS
-import pandas as pd
 import os
-import re
-import numpy as np
-import math
 import csv
+import aggregates
+import data_store
+import dataset
+import group_index
+import http_cache
+import json_encoding
+import metrics
+import normalize
+import refresh
+import row_index
+import sdg_index
 
 # Initialize Flask application with static files directory
 app = Flask(__name__, static_folder='website/static')
-CORS(app)
+CORS(app, expose_headers=['X-Total-Count', 'X-Next-Cursor'])
 
-def load_data():
+def request_as_of():
     """
-    Load and preprocess the financial data from Excel file.
-    Returns a pandas DataFrame with cleaned column names.
+    Return the ingested version picked with ?as_of= for the current request, or None.
     """
-    finance_data = pd.read_excel('Data/CFU-Website-MASTER-Update-for-2025.xlsx', sheet_name='Pledges')
-    finance_data.columns = finance_data.columns.str.strip()
-    return finance_data
+    return g.get('as_of')
 
-def clean_contributor(name):
+def json_bytes_response(body):
     """
-    Clean contributor names by removing parenthetical information.
-    Example: 'Country (Region)' -> 'Country'
+    Wrap already-serialized JSON bytes in a response.
     """
-    return re.split(r'\s*\(', str(name))[0].strip()
+    return Response(body, mimetype='application/json')
 
-def clean_entries(entries):
+def frame_response(df):
     """
-    Clean list entries by converting NaN values to None.
-    Used for JSON serialization.
+    Serialize a DataFrame response in the layout requested with ?orient=.
+    'records' (default) is a list of row objects; 'columns' maps each column to its values.
     """
-    return [None if (isinstance(x, float) and math.isnan(x)) else x for x in entries]
+    orient = request.args.get('orient', 'records')
+    if orient not in json_encoding.ORIENTS:
+        return jsonify({"error": f"orient must be one of {', '.join(json_encoding.ORIENTS)}"}), 400
+    return json_bytes_response(json_encoding.frame_to_json(df, orient))
+
+def raw_data_response(args):
+    """
+    Answer a raw-data query (see api_raw_data) from the pledge index.
+    """
+    try:
+        page, total, next_cursor = row_index.query_rows(dataset.pledge_index(request_as_of()), args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response = frame_response(page)
+    if isinstance(response, Response):
+        response.headers['X-Total-Count'] = str(total)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def sdg_error_response(e):
+    """
+    Report a missing (404) or unreadable (500) ndc_sdg.csv.
+    """
+    return jsonify({"error": str(e)}), 404 if isinstance(e, FileNotFoundError) else 500
+
+def group_view_response(name):
+    """
+    Answer one of the fixed by_contributor / by_country routes.
+    ?entries=1 (with max_entries=) adds each group's entries, as on /api/aggregate.
+    """
+    try:
+        if 'entries' not in request.args:
+            return json_bytes_response(dataset.materialized_views(request_as_of())[name])
+        index = dataset.pledge_groups(request_as_of())
+        args = dict(dataset.GROUP_VIEWS[name], entries=request.args['entries'])
+        if 'max_entries' in request.args:
+            args['max_entries'] = request.args['max_entries']
+        try:
+            query = group_index.parse_query(index, args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return json_bytes_response(json_encoding.dumps(group_index.aggregate(index, query)))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Rows encoded per chunk by the streaming export routes
+EXPORT_CHUNK_ROWS = 1000
+
+# Views available through /api/dashboard, in the order they are returned by default
+DASHBOARD_VIEWS = [
+    'raw_data',
+    'deposited_column',
+    'by_contributor',
+    'by_contributor_math',
+    'by_contributor_clean',
+    'by_contributor_clean_math',
+    'sdg_count_by_country',
+    'by_country',
+    'by_country_math',
+    'by_country_clean',
+    'by_country_clean_math',
+    'ndc_status_table',
+    'ndc_status_points_chart',
+    'deposited_by_ndc_status_countries',
+    'ndc_status_points_chart_overlap',
+    'deposited_by_ndc_status_countries_overlap_order',
+]
+# Views whose source file may be missing, by the function returning their JSON body;
+# /api/dashboard reports their errors per view
+OPTIONAL_VIEWS = {
+    'sdg_count_by_country': dataset.sdg_counts_body,
+}
+
+# Request hooks. Flask runs before_request hooks in the order they are registered and
+# after_request hooks in reverse, so keep them in this order: timing starts first and ends
+# last, and ?as_of= is resolved (an unknown version is a 400) before a conditional
+# request can be answered with 304.
+@app.before_request
+def start_request_metrics():
+    """
+    Start timing the request for /api/_metrics and the Server-Timing header.
+    """
+    metrics.begin_request(request.endpoint or metrics.UNMATCHED_ENDPOINT)
+
+@app.before_request
+def select_as_of_version():
+    """
+    Serve /api requests with ?as_of=<version or ISO date> from that ingested version.
+    """
+    as_of = request.args.get('as_of')
+    if as_of and request.path.startswith('/api/'):
+        try:
+            g.as_of = data_store.resolve_as_of(as_of)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+@app.before_request
+def answer_conditional_request():
+    """
+    Reply 304 to conditional /api requests whose data has not changed since.
+    """
+    return http_cache.not_modified(request)
+
+@app.after_request
+def finish_request_metrics(response):
+    """
+    Record the request's duration and size; runs after every other after_request hook.
+    """
+    # Streamed bodies are not measured, since that would buffer them
+    size = None if response.is_streamed else response.calculate_content_length()
+    timing = metrics.end_request(response.status_code, size)
+    if timing:
+        response.headers['Server-Timing'] = timing
+    return response
+
+@app.after_request
+def add_cache_headers(response):
+    """
+    Attach validators and caching headers to /api responses and compress their bodies.
+    """
+    return http_cache.finalize(request, response)
 
 @app.route('/api/raw_data')
 def api_raw_data():
     """
-    API endpoint to get all raw financial data.
-    Returns the complete dataset as JSON.
+    API endpoint to get the raw financial data.
+    Returns the complete dataset as JSON by default. Query parameters narrow it down:
+    columns=a,b (projection), country= / contributor= (repeatable equality filters),
+    min_deposited= / max_deposited= (inclusive range), sort=Column or sort=-Column,
+    and limit= / cursor= for paging. The total match count and the cursor of the
+    next page are returned in the X-Total-Count and X-Next-Cursor headers.
     """
     try:
-        df = load_data()
-        df = df.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return jsonify(df.to_dict(orient="records"))
+        return raw_data_response(request.args)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -52,33 +178,107 @@ def api_raw_data():
 def api_deposited_column():
     """
     API endpoint to get only the 'Deposited (USD million current)' column.
-    Returns the column data as JSON.
+    Returns the column data as JSON; a projection of /api/raw_data.
     """
     try:
-        df = load_data()
-        if 'Deposited (USD million current)' in df.columns:
-            deposited_df = df[['Deposited (USD million current)']]
-            deposited_df = deposited_df.replace({np.nan: None, np.inf: None, -np.inf: None})
-            return jsonify(deposited_df.to_dict(orient="records"))
+        if aggregates.DEPOSITED in dataset.pledge_index(request_as_of())['frame'].columns:
+            args = request.args.copy()
+            args['columns'] = aggregates.DEPOSITED
+            return raw_data_response(args)
         else:
             return jsonify({"error": "Column not found"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/export/pledges.<fmt>')
+def api_export_pledges(fmt):
+    """
+    API endpoint to download the pledge rows as NDJSON (pledges.ndjson) or CSV (pledges.csv).
+    Accepts the same columns= / country= / contributor= / min_deposited= / max_deposited= /
+    sort= parameters as /api/raw_data. Rows are streamed in chunks of EXPORT_CHUNK_ROWS,
+    so memory stays flat however large the workbook is.
+    """
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"error": "Format must be ndjson or csv"}), 404
+    try:
+        index = dataset.pledge_index(request_as_of())
+        try:
+            positions, columns = row_index.select_rows(index, request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        frame = index['frame']
+
+        def generate():
+            for start in range(0, len(positions), EXPORT_CHUNK_ROWS):
+                chunk = frame.iloc[positions[start:start + EXPORT_CHUNK_ROWS]][columns]
+                if fmt == 'ndjson':
+                    yield json_encoding.frame_to_ndjson(chunk)
+                else:
+                    yield chunk.to_csv(index=False, header=start == 0)
+            if fmt == 'csv' and len(positions) == 0:
+                yield frame[columns].head(0).to_csv(index=False)
+
+        mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+        response = Response(generate(), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=pledges.{fmt}'
+        response.headers['X-Total-Count'] = str(len(positions))
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/aggregate')
+def api_aggregate():
+    """
+    API endpoint to aggregate the pledge rows by any text column.
+    Query parameters: group_by= (column, default Contributor), normalize=1 (group
+    Contributor / Country by cleaned names), metric= (sum, count, mean or nunique of
+    the value= column, default the deposited amount), sort= (value, -value, key or -key),
+    top_n= (keep the first n groups), detail=1 (report {key, Total, Count}, metric=sum
+    only) and entries=1 (detail plus each group's first max_entries= entries and
+    their Sum Math). The /api/by_contributor* and /api/by_country* routes are fixed
+    parameter sets of this endpoint; use /api/aggregate/entries to page through a group.
+    """
+    try:
+        index = dataset.pledge_groups(request_as_of())
+        try:
+            query = group_index.parse_query(index, request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return json_bytes_response(json_encoding.dumps(group_index.aggregate(index, query)))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/aggregate/entries')
+def api_aggregate_entries():
+    """
+    API endpoint to drill down into one group: its individual entries and Sum Math.
+    Takes group_by= / normalize= / value= as /api/aggregate, key= (the group name) and
+    limit= / cursor= for paging (default MAX_ENTRIES entries). The group's entry count and
+    the cursor of the next page are returned in the X-Total-Count and X-Next-Cursor headers.
+    """
+    try:
+        try:
+            result = group_index.group_entries(dataset.pledge_groups(request_as_of()), request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if result is None:
+            return jsonify({"error": "Group not found"}), 404
+        record, total, next_cursor = result
+        response = json_bytes_response(json_encoding.dumps(record))
+        response.headers['X-Total-Count'] = str(total)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/by_contributor')
 def api_by_contributor():
     """
     API endpoint to get total deposits grouped by contributor.
     Returns sorted list of contributors and their total deposits.
     """
-    try:
-        df = load_data()
-        grouped = df.groupby('Contributor', as_index=False)['Deposited (USD million current)'].sum()
-        grouped = grouped.sort_values('Deposited (USD million current)', ascending=True)
-        grouped = grouped.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return jsonify(grouped.to_dict(orient="records"))
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return group_view_response('by_contributor')
 
 @app.route('/api/by_contributor_math')
 def api_by_contributor_math():
@@ -86,20 +286,7 @@ def api_by_contributor_math():
     API endpoint to get detailed contributor data including individual entries and sum calculation.
     Returns contributors with their individual deposits and the mathematical sum.
     """
-    try:
-        df = load_data()
-        details = df.groupby('Contributor')['Deposited (USD million current)'].agg(
-            Total='sum',
-            Entries=lambda x: list(x)
-        ).reset_index()
-        details['Sum Math'] = details['Entries'].apply(
-            lambda x: ' + '.join([str(v) for v in x]) + f' = {sum(x)}'
-        )
-        details = details.replace({np.nan: None, np.inf: None, -np.inf: None})
-        details['Entries'] = details['Entries'].apply(clean_entries)
-        return jsonify(details.to_dict(orient="records"))
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return group_view_response('by_contributor_math')
 
 @app.route('/api/by_contributor_clean')
 def api_by_contributor_clean():
@@ -107,20 +294,7 @@ def api_by_contributor_clean():
     API endpoint to get total deposits grouped by cleaned contributor names.
     Similar to by_contributor but uses cleaned names without parenthetical information.
     """
-    try:
-        df = load_data()
-        df['Contributor_clean'] = df['Contributor'].apply(clean_contributor)
-        # Get all unique contributors
-        all_contributors = pd.DataFrame({'Contributor_clean': df['Contributor_clean'].unique()})
-        grouped = df.groupby('Contributor_clean', as_index=False)['Deposited (USD million current)'].sum()
-        # Merge to ensure all contributors are present, fill missing with 0
-        merged = all_contributors.merge(grouped, on='Contributor_clean', how='left')
-        merged['Deposited (USD million current)'] = merged['Deposited (USD million current)'].fillna(0)
-        merged = merged.sort_values('Deposited (USD million current)', ascending=True)
-        merged = merged.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return jsonify(merged.to_dict(orient="records"))
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return group_view_response('by_contributor_clean')
 
 @app.route('/api/by_contributor_clean_math')
 def api_by_contributor_clean_math():
@@ -128,42 +302,46 @@ def api_by_contributor_clean_math():
     API endpoint to get detailed contributor data with cleaned names.
     Similar to by_contributor_math but uses cleaned contributor names.
     """
-    try:
-        df = load_data()
-        df['Contributor_clean'] = df['Contributor'].apply(clean_contributor)
-        details = df.groupby('Contributor_clean')['Deposited (USD million current)'].agg(
-            Total='sum',
-            Entries=lambda x: list(x)
-        ).reset_index()
-        details['Sum Math'] = details['Entries'].apply(
-            lambda x: ' + '.join([str(v) for v in x]) + f' = {sum(x)}'
-        )
-        details = details.replace({np.nan: None, np.inf: None, -np.inf: None})
-        details['Entries'] = details['Entries'].apply(clean_entries)
-        return jsonify(details.to_dict(orient="records"))
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return group_view_response('by_contributor_clean_math')
 
 @app.route('/api/sdg_count_by_country')
 def api_sdg_count_by_country():
     """
     API endpoint to get SDG (Sustainable Development Goals) count by country.
-    Reads from ndc_sdg.csv and returns the number of unique SDGs per country.
+    Returns the number of SDGs linked to each country in ndc_sdg.csv.
+    """
+    try:
+        return frame_response(dataset.sdg_counts())
+    except Exception as e:
+        return sdg_error_response(e)
+
+@app.route('/api/sdg/<int:goal>/countries')
+def api_sdg_countries(goal):
+    """
+    API endpoint to get the countries whose NDC links to one SDG (1-17), in name order.
+    """
+    if goal not in sdg_index.SDG_GOALS:
+        return jsonify({"error": "SDG must be between 1 and 17"}), 400
+    try:
+        return jsonify({"SDG": goal, "Countries": sdg_index.countries_for_goal(dataset.sdg_linkages(), goal)})
+    except Exception as e:
+        return sdg_error_response(e)
+
+@app.route('/api/sdg_finance')
+def api_sdg_finance():
+    """
+    API endpoint combining the SDG linkages with the deposited totals (by cleaned country name).
+    by=country (default) lists {Country, SDG_Count, Deposited} for the countries in both datasets;
+    by=goal lists, per SDG, the linked countries, how many of them have deposits and their total.
     """
+    by = request.args.get('by', 'country')
+    if by not in ('country', 'goal'):
+        return jsonify({"error": "by must be country or goal"}), 400
     try:
-        # Read the CSV file
-        df = pd.read_csv('Data/ndc_sdg.csv')
-        # Assume columns: Country, SDG (or similar)
-        # If SDG column is not present, try to infer
-        country_col = 'Country' if 'Country' in df.columns else df.columns[0]
-        sdg_col = 'SDG' if 'SDG' in df.columns else df.columns[-1]
-        # Group by country and count unique SDGs
-        grouped = df.groupby(country_col)[sdg_col].nunique().reset_index()
-        grouped.columns = ['Country', 'SDG_Count']
-        grouped = grouped.sort_values('SDG_Count', ascending=True)
-        return jsonify(grouped.to_dict(orient='records'))
+        build = sdg_index.finance_by_country if by == 'country' else sdg_index.finance_by_goal
+        return frame_response(build(dataset.sdg_linkages(), dataset.country_deposited_totals(request_as_of()), normalize.load_aliases()))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return sdg_error_response(e)
 
 @app.route('/api/by_country')
 def api_by_country():
@@ -171,14 +349,7 @@ def api_by_country():
     API endpoint to get total deposits grouped by country.
     Returns sorted list of countries and their total deposits.
     """
-    try:
-        df = load_data()
-        grouped = df.groupby('Country', as_index=False)['Deposited (USD million current)'].sum()
-        grouped = grouped.sort_values('Deposited (USD million current)', ascending=True)
-        grouped = grouped.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return jsonify(grouped.to_dict(orient="records"))
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return group_view_response('by_country')
 
 @app.route('/api/by_country_math')
 def api_by_country_math():
@@ -186,20 +357,7 @@ def api_by_country_math():
     API endpoint to get detailed country data including individual entries and sum calculation.
     Returns countries with their individual deposits and the mathematical sum.
     """
-    try:
-        df = load_data()
-        details = df.groupby('Country')['Deposited (USD million current)'].agg(
-            Total='sum',
-            Entries=lambda x: list(x)
-        ).reset_index()
-        details['Sum Math'] = details['Entries'].apply(
-            lambda x: ' + '.join([str(v) for v in x]) + f' = {sum(x)}'
-        )
-        details = details.replace({np.nan: None, np.inf: None, -np.inf: None})
-        details['Entries'] = details['Entries'].apply(clean_entries)
-        return jsonify(details.to_dict(orient="records"))
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return group_view_response('by_country_math')
 
 @app.route('/api/by_country_clean')
 def api_by_country_clean():
@@ -207,18 +365,7 @@ def api_by_country_clean():
     API endpoint to get total deposits grouped by cleaned country names.
     Similar to by_country but uses cleaned names without parenthetical information.
     """
-    try:
-        df = load_data()
-        df['Country_clean'] = df['Country'].apply(clean_contributor)
-        all_countries = pd.DataFrame({'Country_clean': df['Country_clean'].unique()})
-        grouped = df.groupby('Country_clean', as_index=False)['Deposited (USD million current)'].sum()
-        merged = all_countries.merge(grouped, on='Country_clean', how='left')
-        merged['Deposited (USD million current)'] = merged['Deposited (USD million current)'].fillna(0)
-        merged = merged.sort_values('Deposited (USD million current)', ascending=True)
-        merged = merged.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return jsonify(merged.to_dict(orient="records"))
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return group_view_response('by_country_clean')
 
 @app.route('/api/by_country_clean_math')
 def api_by_country_clean_math():
@@ -226,21 +373,7 @@ def api_by_country_clean_math():
     API endpoint to get detailed country data with cleaned names.
     Similar to by_country_math but uses cleaned country names.
     """
-    try:
-        df = load_data()
-        df['Country_clean'] = df['Country'].apply(clean_contributor)
-        details = df.groupby('Country_clean')['Deposited (USD million current)'].agg(
-            Total='sum',
-            Entries=lambda x: list(x)
-        ).reset_index()
-        details['Sum Math'] = details['Entries'].apply(
-            lambda x: ' + '.join([str(v) for v in x]) + f' = {sum(x)}'
-        )
-        details = details.replace({np.nan: None, np.inf: None, -np.inf: None})
-        details['Entries'] = details['Entries'].apply(clean_entries)
-        return jsonify(details.to_dict(orient="records"))
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return group_view_response('by_country_clean_math')
 
 @app.route('/api/ndc_status_table')
 def api_ndc_status_table():
@@ -248,9 +381,7 @@ def api_ndc_status_table():
     API endpoint to get all rows from NewClimateNDCCompData.xlsx as JSON.
     """
     try:
-        df = pd.read_excel('Data/NewClimateNDCCompData.xlsx')
-        df = df.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return jsonify(df.to_dict(orient="records"))
+        return frame_response(dataset.frame_views(request_as_of())['ndc_status_table'])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -260,17 +391,7 @@ def api_ndc_status_points_chart():
     API endpoint to get a list of {Country, NDC_Status, Points} for charting.
     """
     try:
-        df = pd.read_excel('Data/NewClimateNDCCompData.xlsx')
-        points_map = {
-            'on track': 1,
-            'likely on track': 0.75,
-            'likely off track': 0.5,
-            'off track': 0.25
-        }
-        df['Points'] = df['NDC_Status'].str.strip().str.lower().map(points_map).fillna(0)
-        chart_data = df[['Country', 'NDC_Status', 'Points']].sort_values('Points', ascending=True)
-        chart_data = chart_data.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return jsonify(chart_data.to_dict(orient="records"))
+        return frame_response(dataset.frame_views(request_as_of())['ndc_status_points_chart'])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -280,14 +401,7 @@ def api_deposited_by_ndc_status_countries():
     API endpoint to get total deposited by country, but only for countries present in NewClimateNDCCompData.xlsx.
     """
     try:
-        ndc_df = pd.read_excel('Data/NewClimateNDCCompData.xlsx')
-        ndc_countries = set(ndc_df['Country'].dropna().unique())
-        finance_df = load_data()
-        filtered = finance_df[finance_df['Country'].isin(ndc_countries)]
-        grouped = filtered.groupby('Country', as_index=False)['Deposited (USD million current)'].sum()
-        grouped = grouped.sort_values('Deposited (USD million current)', ascending=True)
-        grouped = grouped.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return jsonify(grouped.to_dict(orient="records"))
+        return frame_response(dataset.frame_views(request_as_of())['deposited_by_ndc_status_countries'])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -297,25 +411,7 @@ def api_ndc_status_points_chart_overlap():
     API endpoint to get NDC status points only for countries present in both datasets, in the exact order of deposited_by_ndc_status_countries_overlap_order (by deposited amount ascending).
     """
     try:
-        ndc_df = pd.read_excel('Data/NewClimateNDCCompData.xlsx')
-        finance_df = load_data()
-        finance_countries = set(finance_df['Country'].dropna().unique())
-        overlap_df = ndc_df[ndc_df['Country'].isin(finance_countries)].copy()
-        points_map = {
-            'on track': 1,
-            'likely on track': 0.75,
-            'likely off track': 0.5,
-            'off track': 0.25
-        }
-        overlap_df['Points'] = overlap_df['NDC_Status'].str.strip().str.lower().map(points_map).fillna(0)
-        # Get the overlap order from the deposited endpoint logic
-        filtered = finance_df[finance_df['Country'].isin(overlap_df['Country'])]
-        order = filtered.groupby('Country', as_index=False)['Deposited (USD million current)'].sum()
-        order = order.sort_values('Deposited (USD million current)', ascending=True)['Country'].tolist()
-        overlap_df['Country'] = pd.Categorical(overlap_df['Country'], categories=order, ordered=True)
-        chart_data = overlap_df[['Country', 'NDC_Status', 'Points']].sort_values('Country')
-        chart_data = chart_data.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return jsonify(chart_data.to_dict(orient="records"))
+        return frame_response(dataset.frame_views(request_as_of())['ndc_status_points_chart_overlap'])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -325,21 +421,95 @@ def api_deposited_by_ndc_status_countries_overlap_order():
     API endpoint to get total deposited by country, only for countries present in both datasets, in the overlap order from the NDC data (no sorting by deposited amount).
     """
     try:
-        ndc_df = pd.read_excel('Data/NewClimateNDCCompData.xlsx')
-        finance_df = load_data()
-        finance_countries = set(finance_df['Country'].dropna().unique())
-        overlap_df = ndc_df[ndc_df['Country'].isin(finance_countries)].copy()
-        # Get the overlap order from the NDC data (no sorting)
-        overlap_order = overlap_df['Country'].tolist()
-        filtered = finance_df[finance_df['Country'].isin(overlap_order)]
-        grouped = filtered.groupby('Country', as_index=False)['Deposited (USD million current)'].sum()
-        grouped['Country'] = pd.Categorical(grouped['Country'], categories=overlap_order, ordered=True)
-        grouped = grouped.sort_values('Country')
-        grouped = grouped.replace({np.nan: None, np.inf: None, -np.inf: None})
-        return jsonify(grouped.to_dict(orient="records"))
+        return frame_response(dataset.frame_views(request_as_of())['deposited_by_ndc_status_countries_overlap_order'])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/dashboard')
+def api_dashboard():
+    """
+    API endpoint to get several views in one request.
+    Takes ?views=name1,name2 (default: every view) where names are the /api/<name> routes,
+    and returns {name: data} with each view computed from the same dataset version.
+    A view that fails is returned as {"error": ...} without failing the others.
+    """
+    try:
+        names = request.args.get('views')
+        names = [n.strip() for n in names.split(',') if n.strip()] if names else list(DASHBOARD_VIEWS)
+        unknown = [n for n in names if n not in DASHBOARD_VIEWS]
+        if unknown:
+            return jsonify({"error": f"Unknown views: {', '.join(unknown)}"}), 400
+        bodies = dataset.dashboard_bodies(request_as_of())
+        parts = []
+        for name in names:
+            if name in OPTIONAL_VIEWS:
+                try:
+                    body = OPTIONAL_VIEWS[name]()
+                except Exception as e:
+                    body = json_encoding.dumps({"error": str(e)})
+            else:
+                body = bodies[name]
+            parts.append(json_encoding.dumps(name) + b':' + body)
+        return json_bytes_response(b'{' + b','.join(parts) + b'}')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/_versions')
+def api_versions():
+    """
+    API endpoint listing the ingested dataset versions usable with ?as_of=, oldest first,
+    with the number of pledges added, changed and removed by each.
+    """
+    return jsonify(data_store.read_history())
+
+@app.route('/api/_metrics')
+def api_metrics():
+    """
+    API endpoint exposing request counts, per-stage timings, response sizes and
+    cache hit/miss counts in the Prometheus text format.
+    """
+    return Response(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/_metrics/profile', methods=['GET', 'POST'])
+def api_metrics_profile():
+    """
+    API endpoint for sampled profiling.
+    GET returns the accumulated profile of the sampled requests as text.
+    POST switches options at runtime: profile_rate= (fraction of requests to profile, 0-1)
+    and server_timing= (1/0 to add or drop the Server-Timing header). It needs the
+    API_METRICS_TOKEN as a bearer token, or a local client when no token is configured.
+    """
+    if request.method == 'POST':
+        if not metrics.may_change_settings(request.remote_addr, request.headers.get('Authorization')):
+            return jsonify({"error": "Not allowed to change metrics settings"}), 403
+        try:
+            rate = request.values.get('profile_rate')
+            timing = request.values.get('server_timing')
+            metrics.set_options(
+                server_timing=None if timing is None else timing == '1',
+                profile_rate=None if rate is None else float(rate),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(metrics.settings)
+    return Response(metrics.profile_report(), content_type='text/plain; charset=utf-8')
+
+@app.route('/api/_health')
+def api_health():
+    """
+    API endpoint reporting liveness and the dataset being served: its version, when and
+    how fast it was built, whether the Data/ watcher runs and the last rebuild error.
+    """
+    return jsonify(refresh.status())
+
+@app.route('/api/_ready')
+def api_ready():
+    """
+    API endpoint for readiness probes: 503 while the startup warm-up is running, 200 after.
+    """
+    state = refresh.status()
+    return jsonify(state), 200 if state['ready'] else 503
+
 @app.route('/')
 def root():
     """
@@ -348,4 +518,7 @@ def root():
     return send_from_directory(app.static_folder, 'index.html')
 
 if __name__ == '__main__':
+    # With the reloader, only its child process serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        refresh.start(dataset.warm_views)
     app.run(debug=True, host='0.0.0.0', port=5050) 
\ No newline at end of file
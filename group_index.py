@@ -0,0 +1,228 @@
+# Import required libraries
+import threading
+import numpy as np
+import pandas as pd
+from aggregates import DEPOSITED
+from row_index import _parse_int
+
+# Columns accepting normalize=1, grouped by their cleaned '<column>_clean' names instead
+NORMALIZED_KEYS = ('Contributor', 'Country')
+METRICS = ('sum', 'count', 'mean', 'nunique')
+SORTS = ('value', '-value', 'key', '-key')
+# Entries returned per group when no limit is given, by aggregate(entries=1) and group_entries()
+MAX_ENTRIES = 50
+
+
+def build_group_index(df):
+    """
+    Build the per-key structures used by aggregate().
+    For every text column (including the *_clean columns), rows are factorized into
+    codes numbered in key order and stored sorted by code, with the offsets where
+    each group starts: the rows of group i are order[offsets[i]:offsets[i + 1]],
+    in their original row order. Rows with a missing key belong to no group.
+    """
+    index = {'frame': df, 'keys': {}, 'metrics': {}, 'lock': threading.Lock()}
+    for column in df.columns:
+        if pd.api.types.is_numeric_dtype(df[column]):
+            continue
+        codes, names = pd.factorize(df[column], sort=True)
+        present = np.flatnonzero(codes >= 0)
+        order = present[np.argsort(codes[present], kind='stable')]
+        offsets = np.searchsorted(codes[order], np.arange(len(names) + 1))
+        index['keys'][column] = {'names': np.asarray(names, dtype=object), 'codes': codes,
+                                 'order': order, 'offsets': offsets}
+    return index
+
+
+def _group_values(index, key, metric, value):
+    """
+    Return the metric of the `value` column for every group of `key`, in key order.
+    Each (key, metric, value) combination is computed once per index.
+    """
+    cache_key = (key, metric, value)
+    result = index['metrics'].get(cache_key)
+    if result is not None:
+        return result
+    groups = index['keys'][key]
+    if metric == 'count':
+        values = index['frame'][value].notna().to_numpy()[groups['order']]
+        result = np.add.reduceat(values.astype(np.int64), groups['offsets'][:-1]) if len(values) else values
+    else:
+        # pandas sums with compensated summation, so the totals match a plain groupby
+        order = groups['order']
+        column = index['frame'][value].iloc[order].reset_index(drop=True)
+        result = column.groupby(groups['codes'][order]).agg(metric).to_numpy()
+    with index['lock']:
+        index['metrics'][cache_key] = result
+    return result
+
+
+def _group_rows(index, key, position):
+    """
+    Return the row positions of the group at `position`, in row order.
+    """
+    groups = index['keys'][key]
+    return groups['order'][groups['offsets'][position]:groups['offsets'][position + 1]]
+
+
+def find_group(index, key, name):
+    """
+    Return the position of the group named `name`, or None when there is no such group.
+    """
+    names = index['keys'][key]['names']
+    position = int(np.searchsorted(names, name))
+    if position < len(names) and names[position] == name:
+        return position
+    return None
+
+
+def _sum_math(entries, start, stop):
+    """
+    Write a group's sum out as 'a + b + c = total', showing only entries[start:stop].
+    Left-out entries are marked with '...'.
+    """
+    terms = [str(v) for v in entries[start:stop]]
+    if start > 0:
+        terms.insert(0, '...')
+    if stop < len(entries):
+        terms.append('...')
+    return ' + '.join(terms) + f' = {sum(entries)}'
+
+
+def _parse_key(index, args):
+    """
+    Return the group column selected by the group_by and normalize parameters.
+    """
+    key = args.get('group_by', 'Contributor')
+    if args.get('normalize') in ('1', 'true'):
+        if key not in NORMALIZED_KEYS:
+            raise ValueError(f"normalize is only supported for {', '.join(NORMALIZED_KEYS)}")
+        key = f'{key}_clean'
+    if key not in index['keys']:
+        raise ValueError(f"Unknown group_by column: {key}")
+    return key
+
+
+def parse_query(index, args):
+    """
+    Validate the parameters of an aggregate query.
+    `args` maps group_by, normalize, metric, value, sort, top_n, detail, entries and
+    max_entries to strings (a request's query parameters or a plain dict).
+    Returns a dict of parsed parameters. Raises ValueError for invalid parameters.
+    """
+    df = index['frame']
+    key = _parse_key(index, args)
+    metric = args.get('metric', 'sum')
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+    value = args.get('value', DEPOSITED)
+    if value not in df.columns:
+        raise ValueError(f"Unknown value column: {value}")
+    if metric in ('sum', 'mean') and not pd.api.types.is_numeric_dtype(df[value]):
+        raise ValueError(f"metric {metric} needs a numeric value column")
+    sort = args.get('sort', 'value')
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SORTS)}")
+    top_n = args.get('top_n')
+    if top_n is not None:
+        top_n = _parse_int('top_n', top_n, 1)
+    entries = args.get('entries') in ('1', 'true')
+    detail = entries or args.get('detail') in ('1', 'true')
+    if detail and metric != 'sum':
+        raise ValueError("detail and entries are only supported for metric=sum")
+    max_entries = _parse_int('max_entries', args.get('max_entries', MAX_ENTRIES), 1)
+    return {'key': key, 'metric': metric, 'value': value, 'sort': sort, 'top_n': top_n,
+            'detail': detail, 'entries': entries, 'max_entries': max_entries}
+
+
+def _positions(values, sort, top_n):
+    """
+    Return the positions of the groups (given in key order) in the requested order.
+    """
+    if sort == 'key':
+        positions = np.arange(len(values))
+    elif sort == '-key':
+        positions = np.arange(len(values))[::-1]
+    else:
+        positions = pd.Series(values).sort_values(ascending=sort == 'value').index.to_numpy()
+    return positions if top_n is None else positions[:top_n]
+
+
+def _records(key, value_name, names, values, sizes, positions, detail):
+    """
+    Build the {key, value} records (with detail, {key, Total, Count}) of the groups at `positions`.
+    """
+    group_names = names[positions].tolist()
+    group_values = values[positions].tolist()
+    if not detail:
+        return [{key: name, value_name: v} for name, v in zip(group_names, group_values)]
+    return [{key: name, 'Total': total, 'Count': size}
+            for name, total, size in zip(group_names, group_values, sizes[positions].tolist())]
+
+
+def aggregate(index, query):
+    """
+    Answer a parsed aggregate query (see parse_query) from the group index.
+    Returns a list of records: {key, value} where the value is named after the value
+    column for metric=sum and after the metric otherwise; with detail=1 {key, Total, Count};
+    and with entries=1 also the group's first max_entries Entries and their Sum Math.
+    """
+    key = query['key']
+    values = _group_values(index, key, query['metric'], query['value'])
+    value_name = query['value'] if query['metric'] == 'sum' else query['metric']
+    positions = _positions(values, query['sort'], query['top_n'])
+    records = _records(key, value_name, index['keys'][key]['names'], values,
+                       np.diff(index['keys'][key]['offsets']), positions, query['detail'])
+    if query['entries']:
+        column = index['frame'][query['value']].to_numpy()
+        limit = query['max_entries']
+        for record, position in zip(records, positions):
+            entries = column[_group_rows(index, key, position)].tolist()
+            record['Entries'] = entries[:limit]
+            record['Sum Math'] = _sum_math(entries, 0, limit)
+    return records
+
+
+def aggregate_totals(totals, key, sort='value', detail=False):
+    """
+    Answer a deposited-sum aggregate query without entries from precomputed totals instead
+    of the rows: `totals` is a DataFrame indexed by the `key` values in key order, with
+    'sum' and 'count' columns (see aggregates.deposited_sums). Returns the same records
+    as aggregate() for group_by=key, sort=sort and detail=detail.
+    """
+    values = totals['sum'].to_numpy()
+    return _records(key, DEPOSITED, totals.index.to_numpy(dtype=object), values,
+                    totals['count'].to_numpy(), _positions(values, sort, None), detail)
+
+
+def group_entries(index, args):
+    """
+    Return one page of a group's entries for the drill-down endpoint.
+    `args` holds group_by, normalize and value (as for parse_query), key (the group name)
+    and limit / cursor for paging (limit defaults to MAX_ENTRIES).
+    Returns (record, total entries, next cursor or None), or None when the group does not exist;
+    the record is {key, Total, Count, Entries, Sum Math} with the page's entries.
+    Raises ValueError for invalid parameters.
+    """
+    key = _parse_key(index, args)
+    value = args.get('value', DEPOSITED)
+    if value not in index['frame'].columns or not pd.api.types.is_numeric_dtype(index['frame'][value]):
+        raise ValueError("value must be a numeric column")
+    name = args.get('key')
+    if name is None:
+        raise ValueError("key is required")
+    start = _parse_int('cursor', args.get('cursor', 0), 0)
+    stop = start + _parse_int('limit', args.get('limit', MAX_ENTRIES), 1)
+    position = find_group(index, key, name)
+    if position is None:
+        return None
+    entries = index['frame'][value].to_numpy()[_group_rows(index, key, position)].tolist()
+    total = _group_values(index, key, 'sum', value)[position]
+    record = {
+        key: name,
+        'Total': total,
+        'Count': len(entries),
+        'Entries': entries[start:stop],
+        'Sum Math': _sum_math(entries, start, stop),
+    }
+    return record, len(entries), str(stop) if stop < len(entries) else None
@@ -0,0 +1,177 @@
+# Import required libraries
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from flask import Response, g
+from werkzeug.http import http_date, parse_date
+import data_store
+import metrics
+import refresh
+
+# brotli is optional; gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Seconds a client may reuse an /api response before revalidating it with its ETag
+MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', '60'))
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 500
+# Compressed bodies kept per (ETag, encoding)
+MAX_COMPRESSED_BODIES = 256
+
+_compressed = OrderedDict()
+_compressed_lock = threading.Lock()
+
+
+def is_cacheable(request):
+    """
+    Only GET/HEAD requests for versioned /api data carry validators.
+    Paths under /api/_ (metrics, health) are excluded.
+    """
+    return request.method in ('GET', 'HEAD') and request.path.startswith('/api/') \
+        and not request.path.startswith('/api/_')
+
+
+def last_modified():
+    """
+    Return the newest modification time of the dataset's files as a Unix timestamp.
+    While the refresh worker serves a published snapshot, its files' time is used.
+    """
+    if refresh.serving() is not None:
+        return refresh.status()['last_modified']
+    return data_store.last_modified()
+
+
+def entity_tag(request):
+    """
+    Return the strong ETag for a request: the served dataset version plus a digest of the URL.
+    """
+    digest = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:12]
+    return f'{refresh.current_version()}-{digest}'
+
+
+def _matching_tag(if_none_match, tag):
+    """
+    Return the entity-tag in an If-None-Match header that matches `tag`, or None.
+    Tags of compressed representations ("<tag>-gzip", "<tag>-br") match too.
+    """
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return f'"{tag}"'
+        opaque = candidate.removeprefix('W/').strip('"')
+        if opaque in (tag, f'{tag}-gzip', f'{tag}-br'):
+            return candidate
+    return None
+
+
+def _cache_headers(response, tag, modified, encoding=None):
+    """
+    Set the validator and caching headers on a response.
+    """
+    response.headers['ETag'] = f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+    response.headers['Last-Modified'] = http_date(modified)
+    response.headers['Cache-Control'] = f'public, max-age={MAX_AGE}, must-revalidate'
+    response.vary.add('Accept-Encoding')
+
+
+def not_modified(request):
+    """
+    Answer a conditional request with 304 when the client's copy is current.
+    Runs before the view, so a matching request never touches pandas.
+    Returns None when the request should be handled normally.
+    """
+    if not is_cacheable(request):
+        return None
+    try:
+        tag = entity_tag(request)
+        modified = last_modified()
+    except OSError:
+        return None
+    g.etag = tag
+    g.last_modified = modified
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        matched = _matching_tag(if_none_match, tag)
+        if matched is None:
+            return None
+    else:
+        since = parse_date(request.headers.get('If-Modified-Since'))
+        if since is None or int(modified) > since.timestamp():
+            return None
+        matched = None
+    metrics.count('not_modified_total')
+    response = Response(status=304)
+    _cache_headers(response, tag, modified)
+    if matched is not None:
+        response.headers['ETag'] = matched
+    return response
+
+
+def _encoding_for(request):
+    """
+    Pick the best content-coding the client accepts: br, then gzip, else None.
+    """
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(body, encoding):
+    """
+    Compress a response body with the given content-coding.
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _compressed_body(tag, encoding, body):
+    """
+    Return the compressed body for a tag, compressing it only the first time.
+    """
+    key = (tag, encoding)
+    with _compressed_lock:
+        if key in _compressed:
+            _compressed.move_to_end(key)
+            metrics.cache_result('compressed_body', True)
+            return _compressed[key]
+    metrics.cache_result('compressed_body', False)
+    with metrics.stage('compress'):
+        compressed = _compress(body, encoding)
+    with _compressed_lock:
+        _compressed[key] = compressed
+        while len(_compressed) > MAX_COMPRESSED_BODIES:
+            _compressed.popitem(last=False)
+    return compressed
+
+
+def finalize(request, response):
+    """
+    Add ETag / Last-Modified / Cache-Control to successful /api responses and
+    compress their bodies when the client accepts it.
+    """
+    tag = g.pop('etag', None)
+    modified = g.pop('last_modified', None)
+    if tag is None or response.status_code != 200:
+        return response
+    if response.is_streamed or response.direct_passthrough:
+        # Streamed bodies are sent as produced, so they get validators but no compression
+        _cache_headers(response, tag, modified)
+        return response
+    encoding = _encoding_for(request)
+    body = response.get_data()
+    if encoding is None or len(body) < MIN_COMPRESS_SIZE or 'Content-Encoding' in response.headers:
+        _cache_headers(response, tag, modified)
+        return response
+    response.set_data(_compressed_body(tag, encoding, body))
+    response.headers['Content-Encoding'] = encoding
+    _cache_headers(response, tag, modified, encoding)
+    return response
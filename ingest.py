@@ -0,0 +1,363 @@
+# Import required libraries
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import aggregates
+import data_store
+import normalize
+from data_store import feather, pa
+
+# fcntl is unavailable on Windows, where concurrent ingests are not serialized
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Columns identifying a pledge; rows with the same key but other values count as changed
+PLEDGE_KEY = ['Fund', 'Contributor', 'Country']
+# Group columns whose deposited totals are stored with each version (see update_totals)
+TOTALS_KEYS = ['Contributor', 'Country', 'Contributor_clean', 'Country_clean']
+
+
+def _write_atomic(path, write):
+    """
+    Write a file through a unique temporary name so readers never see a partial file
+    and concurrent writers do not collide.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        os.chmod(tmp_path, 0o644)
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def snapshot_lock(snapshot_dir):
+    """
+    Hold an exclusive lock on the snapshot directory, shared between processes
+    (several server workers can start an ingest at the same time).
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(os.path.join(snapshot_dir, '.lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_json(path, data):
+    """
+    Atomically write `data` as JSON.
+    """
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    _write_atomic(path, write)
+
+
+def _write_table(path, df):
+    """
+    Atomically write a DataFrame as an uncompressed Arrow file, so it can be memory-mapped.
+    """
+    _write_atomic(path, lambda tmp: feather.write_feather(df, tmp, compression='uncompressed'))
+
+
+def arrow_compatible(df):
+    """
+    Return the frame with every object column Arrow cannot store as one type (numbers
+    mixed with text such as 'n/a' in a hand-edited sheet) converted to strings.
+    Missing values stay missing; other columns are left as they are.
+    """
+    converted = {}
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        try:
+            pa.array(df[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            converted[column] = df[column].map(str, na_action='ignore')
+    return df.assign(**converted) if converted else df
+
+
+def row_fingerprints(df):
+    """
+    Return a 64-bit hash of every row's values.
+    """
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _keyed_fingerprints(df, key):
+    """
+    Return each row's key hash, its fingerprint and its position.
+    """
+    return pd.DataFrame({
+        'key': pd.util.hash_pandas_object(df[key], index=False).to_numpy(),
+        'fingerprint': row_fingerprints(df),
+        'position': np.arange(len(df)),
+    })
+
+
+def _pair_rows(old, new, on):
+    """
+    Outer-join two _keyed_fingerprints() frames on the `on` columns plus an occurrence number,
+    so rows repeating the same values are paired in order.
+    """
+    def numbered(rows):
+        return rows.assign(occurrence=rows.groupby(on).cumcount().to_numpy())
+
+    return numbered(old).merge(numbered(new), on=on + ['occurrence'], how='outer',
+                               suffixes=('_old', '_new'), indicator=True)
+
+
+def diff_pledges(old_df, new_df, key=None):
+    """
+    Compare two versions of the Pledges sheet row by row.
+    Rows with the same key and fingerprint are matched first and are unchanged; the
+    remaining rows are then matched on the pledge key (repeated keys in order), and
+    those matched count as changed. Returns a dict of DataFrames: 'added' and 'removed'
+    rows, the 'changed_old' / 'changed_new' versions of rows whose values changed, and
+    the 'old' / 'new' positions of the 'unchanged' rows.
+    """
+    key = key or PLEDGE_KEY
+    old = _keyed_fingerprints(old_df, key)
+    new = _keyed_fingerprints(new_df, key)
+    same = _pair_rows(old, new, ['key', 'fingerprint'])
+    same = same[same['_merge'] == 'both']
+    old = old[~old['position'].isin(same['position_old'])]
+    new = new[~new['position'].isin(same['position_new'])]
+    merged = _pair_rows(old.drop(columns='fingerprint'), new.drop(columns='fingerprint'), ['key'])
+    changed = merged[merged['_merge'] == 'both']
+    removed = merged.loc[merged['_merge'] == 'left_only', 'position_old'].astype(int)
+    added = merged.loc[merged['_merge'] == 'right_only', 'position_new'].astype(int)
+    return {
+        'added': new_df.iloc[np.sort(added.to_numpy())],
+        'removed': old_df.iloc[np.sort(removed.to_numpy())],
+        'changed_old': old_df.iloc[changed['position_old'].astype(int).to_numpy()],
+        'changed_new': new_df.iloc[changed['position_new'].astype(int).to_numpy()],
+        'unchanged': pd.DataFrame({'old': same['position_old'].astype(int).to_numpy(),
+                                   'new': same['position_new'].astype(int).to_numpy()}),
+    }
+
+
+def with_clean_keys(df, aliases):
+    """
+    Return the pledge rows with the cleaned Contributor_clean / Country_clean columns added.
+    """
+    return df.assign(Contributor_clean=normalize.normalize_names(df['Contributor'], aliases),
+                     Country_clean=normalize.normalize_names(df['Country'], aliases))
+
+
+def _reordered_keys(new_df, unchanged, key):
+    """
+    Return the `key` values whose unchanged rows are in a different relative order than
+    in the previous version; their totals would otherwise be summed in another order.
+    """
+    pairs = unchanged.sort_values('old')
+    rows = pd.DataFrame({'key': new_df[key].to_numpy()[pairs['new'].to_numpy()],
+                         'new': pairs['new'].to_numpy()})
+    moved = rows.groupby('key')['new'].diff() < 0
+    return rows.loc[moved.to_numpy(), 'key'].unique()
+
+
+def update_totals(previous, old_df, new_df, diff):
+    """
+    Return the deposited totals of every TOTALS_KEYS column for the new pledge rows.
+    `previous` holds the previous version's totals by key (see data_store.read_version_totals)
+    and `diff` the diff_pledges() result, both frames with the clean key columns added.
+    Only the keys of added, removed and changed rows (or of rows whose order changed) are
+    summed again, over all their rows in sheet order, so the totals stay equal to a full
+    groupby; a key without previous totals is computed in full.
+    """
+    touched_rows = [diff['added'], diff['removed'], diff['changed_old'], diff['changed_new']]
+    totals = {}
+    for key in TOTALS_KEYS:
+        kept = previous.get(key)
+        if kept is None or old_df[aggregates.DEPOSITED].dtype != new_df[aggregates.DEPOSITED].dtype:
+            totals[key] = aggregates.deposited_sums(new_df, key)
+            continue
+        touched = pd.concat([rows[key] for rows in touched_rows]).dropna().unique()
+        touched = np.union1d(touched, _reordered_keys(new_df, diff['unchanged'], key))
+        recomputed = aggregates.deposited_sums(new_df[new_df[key].isin(touched)], key)
+        totals[key] = pd.concat([kept[~kept.index.isin(touched)], recomputed]).sort_index()
+    return totals
+
+
+def _totals_table(totals):
+    """
+    Stack the totals by key into one long table (group_by, name, sum, count).
+    """
+    return pd.concat([
+        frame.rename_axis('name').reset_index().assign(group_by=key)[['group_by', 'name', 'sum', 'count']]
+        for key, frame in totals.items()
+    ], ignore_index=True)
+
+
+def build_snapshot(sources=None, snapshot_dir=None, keep=None, if_stale=False):
+    """
+    Compile the Excel sources into Arrow (feather v2) tables plus a manifest.
+    The manifest records each source's size, mtime and SHA-256 so loaders can
+    tell when the snapshot is stale.
+
+    When the sources differ from the latest recorded version, the Pledges rows are
+    diffed against it and the tables are also stored as a new entry of the version
+    history (used by ?as_of=).
+    `keep` limits how many versions are retained. With `if_stale`, a snapshot that is
+    already current (possibly built by another process while this one waited for the
+    lock) is returned as it is. Returns the manifest.
+    """
+    if feather is None:
+        raise RuntimeError("Building the snapshot requires pyarrow (pip install pyarrow)")
+    sources = sources or data_store.SOURCES
+    snapshot_dir = snapshot_dir or data_store.SNAPSHOT_DIR
+    with snapshot_lock(snapshot_dir):
+        manifest = data_store.read_manifest(snapshot_dir)
+        if if_stale and data_store.manifest_is_current(manifest, sources):
+            return manifest
+        return _build_snapshot(sources, snapshot_dir, keep)
+
+
+def _build_snapshot(sources, snapshot_dir, keep):
+    """
+    Build the snapshot; the caller holds the snapshot lock.
+    """
+    created = datetime.now(timezone.utc)
+    manifest = {
+        'created': created.isoformat(),
+        'sources': {},
+        'tables': {},
+    }
+    frames = {}
+    for path, sheet_name in sources:
+        stat = os.stat(path)
+        # Converted before the diff too, so it compares like with the stored versions
+        df = arrow_compatible(data_store.read_sheet(path, sheet_name))
+        name = data_store.table_name(path, sheet_name)
+        frames[name] = df
+        _write_table(os.path.join(snapshot_dir, name + '.arrow'), df)
+        manifest['sources'][os.path.basename(path)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': data_store.file_sha256(path),
+        }
+        manifest['tables'][name] = {
+            'file': name + '.arrow',
+            'source': os.path.basename(path),
+            'sheet': sheet_name,
+            'rows': len(df),
+            'columns': {col: str(dtype) for col, dtype in df.dtypes.items()},
+        }
+
+    history = data_store.read_history(snapshot_dir)
+    hashes = {source: entry['sha256'] for source, entry in manifest['sources'].items()}
+    if not history or history[-1]['sources'] != hashes:
+        entry = record_version(snapshot_dir, history, frames, hashes, created)
+        manifest['version'] = entry['version']
+        if keep:
+            prune_versions(snapshot_dir, keep)
+    else:
+        manifest['version'] = history[-1]['version']
+
+    _write_json(os.path.join(snapshot_dir, data_store.MANIFEST_NAME), manifest)
+    return manifest
+
+
+def record_version(snapshot_dir, history, frames, hashes, created):
+    """
+    Store the tables as a new version, diffing the pledges against the previous version
+    and updating its deposited totals from the diff (see update_totals).
+    Returns the new history entry.
+    """
+    pledges_name = data_store.table_name(data_store.FINANCE_WORKBOOK, data_store.FINANCE_SHEET)
+    new_pledges = frames[pledges_name]
+    digest = hashlib.sha1(json.dumps(hashes, sort_keys=True).encode()).hexdigest()[:8]
+    version = f"{created.strftime('%Y%m%dT%H%M%SZ')}-{digest}"
+    version_dir = data_store.version_dir(version, snapshot_dir)
+    os.makedirs(version_dir, exist_ok=True)
+
+    previous = history[-1] if history else None
+    old_pledges = None
+    previous_totals = {}
+    if previous is not None:
+        previous_dir = data_store.version_dir(previous['version'], snapshot_dir)
+        old_path = os.path.join(previous_dir, pledges_name + '.arrow')
+        if os.path.exists(old_path):
+            old_pledges = feather.read_table(old_path).to_pandas()
+            previous_totals = data_store.read_version_totals(previous['version'], snapshot_dir)
+    aliases = normalize.load_aliases()
+    new_keyed = with_clean_keys(new_pledges, aliases)
+    if old_pledges is not None:
+        old_keyed = with_clean_keys(old_pledges, aliases)
+        diff = diff_pledges(old_keyed, new_keyed)
+    else:
+        old_keyed = empty = new_keyed.head(0)
+        diff = {'added': new_keyed, 'removed': empty, 'changed_old': empty, 'changed_new': empty,
+                'unchanged': pd.DataFrame({'old': [], 'new': []}, dtype=int)}
+    totals = update_totals(previous_totals, old_keyed, new_keyed, diff)
+
+    for name, df in frames.items():
+        _write_table(os.path.join(version_dir, name + '.arrow'), df)
+    _write_table(os.path.join(version_dir, data_store.TOTALS_NAME), _totals_table(totals))
+    entry = {
+        'version': version,
+        'created': created.isoformat(),
+        'sources': hashes,
+        'aliases': data_store.aliases_sha256(),
+        'rows': len(new_pledges),
+        'diff': {
+            'base': previous['version'] if previous else None,
+            'added': len(diff['added']),
+            'changed': len(diff['changed_new']),
+            'removed': len(diff['removed']),
+        },
+    }
+    history.append(entry)
+    _write_json(os.path.join(snapshot_dir, data_store.HISTORY_NAME), history)
+    return entry
+
+
+def prune_versions(snapshot_dir, keep):
+    """
+    Delete all but the `keep` most recent versions from disk and from the history.
+    """
+    history = data_store.read_history(snapshot_dir)
+    for entry in history[:-keep]:
+        version_dir = data_store.version_dir(entry['version'], snapshot_dir)
+        for file_name in os.listdir(version_dir):
+            os.remove(os.path.join(version_dir, file_name))
+        os.rmdir(version_dir)
+    _write_json(os.path.join(snapshot_dir, data_store.HISTORY_NAME), history[-keep:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the Data/ workbooks into a columnar snapshot.')
+    parser.add_argument('--out', default=data_store.SNAPSHOT_DIR, help='snapshot directory')
+    parser.add_argument('--keep', type=int, help='number of versions to retain in the history')
+    args = parser.parse_args()
+    if feather is None:
+        parser.error('pyarrow is required to build the snapshot (pip install pyarrow)')
+    manifest = build_snapshot(snapshot_dir=args.out, keep=args.keep)
+    for name, table in manifest['tables'].items():
+        print(f"{name}: {table['rows']} rows -> {os.path.join(args.out, table['file'])}")
+    latest = data_store.read_history(args.out)[-1]
+    diff = latest['diff']
+    print(f"version {latest['version']}: +{diff['added']} ~{diff['changed']} -{diff['removed']} pledges"
+          f" (base {diff['base']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Import required libraries
+import json
+import math
+import numpy as np
+import pandas as pd
+import metrics
+
+# orjson is optional; the standard library encoder is used when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Supported layouts for DataFrame responses
+ORIENTS = ('records', 'columns')
+
+
+def _default(value):
+    """
+    Encode values the JSON encoders do not know about.
+    Missing-value markers and non-finite numbers become null, anything else its string form.
+    """
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, np.generic):
+        return _finite(value.item())
+    return str(value)
+
+
+def _finite(obj):
+    """
+    Replace NaN and +/-inf with None throughout plain Python data, as orjson writes them.
+    """
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+def _column_values(series):
+    """
+    Return a column as a list of plain Python values.
+    """
+    return series.to_numpy().tolist()
+
+
+def dumps(obj):
+    """
+    Serialize plain Python data (lists, dicts, scalars) to JSON bytes.
+    NaN and +/-inf are written as null by either encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_finite(obj), default=_default, separators=(',', ':'), allow_nan=False).encode('utf-8')
+
+
+def frame_to_ndjson(df):
+    """
+    Serialize a DataFrame as newline-delimited JSON: one object per row, each line ending in \n.
+    """
+    metrics.count('rows_serialized_total', len(df))
+    with metrics.stage('serialize'):
+        columns = [str(col) for col in df.columns]
+        data = [_column_values(df.iloc[:, i]) for i in range(len(columns))]
+        return b''.join(dumps(dict(zip(columns, row))) + b'\n' for row in zip(*data))
+
+
+def frame_to_json(df, orient='records'):
+    """
+    Serialize a DataFrame straight from its columns to JSON bytes.
+    orient='records' gives [{column: value, ...}, ...] (the default, as to_dict would);
+    orient='columns' gives the compact {column: [values, ...], ...} layout.
+    NaN and +/-inf are written as null.
+    """
+    if orient not in ORIENTS:
+        raise ValueError(f"orient must be one of {', '.join(ORIENTS)}")
+    metrics.count('rows_serialized_total', len(df))
+    with metrics.stage('serialize'):
+        columns = [str(col) for col in df.columns]
+        data = [_column_values(df.iloc[:, i]) for i in range(len(columns))]
+        if orient == 'columns':
+            return dumps(dict(zip(columns, data)))
+        return dumps([dict(zip(columns, row)) for row in zip(*data)])
@@ -0,0 +1,240 @@
+# Import required libraries
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Runtime-switchable settings (see set_options)
+settings = {
+    # Add a Server-Timing header with the per-stage timings to every response
+    'server_timing': os.environ.get('API_SERVER_TIMING', '0') == '1',
+    # Fraction of requests run under cProfile
+    'profile_rate': float(os.environ.get('API_PROFILE_RATE', '0')),
+}
+
+# Token required to change the settings over HTTP; when unset, only local clients may change them
+CONTROL_TOKEN = os.environ.get('API_METRICS_TOKEN')
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+# Endpoint label of requests that match no route, so unknown URLs cannot add label values
+UNMATCHED_ENDPOINT = '<unmatched>'
+
+# Upper bounds (seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_lock = threading.Lock()
+_local = threading.local()
+# (endpoint, stage) -> [total seconds, count]
+_stages = defaultdict(lambda: [0.0, 0])
+# (metric name, sorted label pairs) -> value
+_counters = defaultdict(float)
+# endpoint -> per-bucket counts, plus the +Inf bucket, total seconds and count
+_durations = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1) + [0.0, 0])
+_profile_stats = None
+
+
+def _current():
+    """
+    Return the state of the request being handled on this thread, or None.
+    """
+    return getattr(_local, 'request', None)
+
+
+def set_options(server_timing=None, profile_rate=None):
+    """
+    Switch Server-Timing headers and sampled profiling on or off at runtime.
+    """
+    if server_timing is not None:
+        settings['server_timing'] = bool(server_timing)
+    if profile_rate is not None:
+        if not 0 <= profile_rate <= 1:
+            raise ValueError('profile_rate must be between 0 and 1')
+        settings['profile_rate'] = profile_rate
+
+
+def may_change_settings(remote_addr, authorization):
+    """
+    Check whether a client may change the settings at runtime: with CONTROL_TOKEN set it
+    must send 'Bearer <token>', otherwise it must connect from this machine.
+    """
+    if CONTROL_TOKEN:
+        return hmac.compare_digest(authorization or '', f'Bearer {CONTROL_TOKEN}')
+    return remote_addr in LOCAL_ADDRESSES
+
+
+def count(name, value=1, **labels):
+    """
+    Add `value` to a counter. The current request's endpoint is added as a label.
+    """
+    state = _current()
+    labels.setdefault('endpoint', state['endpoint'] if state else '-')
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += value
+
+
+def cache_result(cache, hit):
+    """
+    Count a cache lookup as a hit or a miss.
+    """
+    count('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+def record_stage(stage, seconds):
+    """
+    Record the duration of one stage for the current request (if any) and the totals.
+    """
+    state = _current()
+    endpoint = state['endpoint'] if state else '-'
+    if state is not None:
+        state['stages'].append((stage, seconds))
+    with _lock:
+        entry = _stages[(endpoint, stage)]
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def stage(name):
+    """
+    Time the enclosed block as a named stage, e.g. `with metrics.stage('read_excel'):`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def begin_request(endpoint):
+    """
+    Start tracking a request on this thread, profiling it if it is sampled.
+    """
+    profiler = None
+    if settings['profile_rate'] > 0 and random.random() < settings['profile_rate']:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (one at a time on Python 3.12+)
+            profiler = None
+    _local.request = {
+        'endpoint': endpoint,
+        'start': time.perf_counter(),
+        'stages': [],
+        'profiler': profiler,
+    }
+
+
+def end_request(status, response_bytes):
+    """
+    Finish tracking the request on this thread.
+    Returns the Server-Timing header value, or None when the header is switched off.
+    """
+    global _profile_stats
+    state = _current()
+    if state is None:
+        return None
+    _local.request = None
+    elapsed = time.perf_counter() - state['start']
+    endpoint = state['endpoint']
+    if state['profiler'] is not None:
+        state['profiler'].disable()
+        with _lock:
+            if _profile_stats is None:
+                _profile_stats = pstats.Stats(state['profiler'])
+            else:
+                _profile_stats.add(state['profiler'])
+    with _lock:
+        _counters[('requests_total', (('endpoint', endpoint), ('status', str(status))))] += 1
+        if response_bytes is not None:
+            _counters[('response_bytes_total', (('endpoint', endpoint),))] += response_bytes
+        histogram = _durations[endpoint]
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if elapsed <= bound:
+                histogram[i] += 1
+        histogram[len(DURATION_BUCKETS)] += 1
+        histogram[-2] += elapsed
+        histogram[-1] += 1
+    if not settings['server_timing']:
+        return None
+    parts = [f'{name.replace(":", "_")};dur={seconds * 1000:.2f}' for name, seconds in state['stages']]
+    parts.append(f'total;dur={elapsed * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def _labels(pairs):
+    """
+    Format label pairs as a Prometheus label set.
+    """
+    if not pairs:
+        return ''
+    escaped = []
+    for key, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_prometheus():
+    """
+    Render every metric in the Prometheus text exposition format.
+    """
+    with _lock:
+        counters = dict(_counters)
+        stages = {key: list(value) for key, value in _stages.items()}
+        durations = {key: list(value) for key, value in _durations.items()}
+    lines = []
+    by_name = defaultdict(list)
+    for (name, labels), value in sorted(counters.items()):
+        by_name[name].append((labels, value))
+    for name, samples in by_name.items():
+        lines.append(f'# TYPE ndc_api_{name} counter')
+        for labels, value in samples:
+            lines.append(f'ndc_api_{name}{_labels(labels)} {value:g}')
+    lines.append('# TYPE ndc_api_stage_seconds summary')
+    for (endpoint, stage_name), (total, n) in sorted(stages.items()):
+        labels = _labels((('endpoint', endpoint), ('stage', stage_name)))
+        lines.append(f'ndc_api_stage_seconds_sum{labels} {total:.6f}')
+        lines.append(f'ndc_api_stage_seconds_count{labels} {n}')
+    lines.append('# TYPE ndc_api_request_duration_seconds histogram')
+    for endpoint, histogram in sorted(durations.items()):
+        for bound, n in zip(DURATION_BUCKETS + ('+Inf',), histogram):
+            labels = _labels((('endpoint', endpoint), ('le', bound)))
+            lines.append(f'ndc_api_request_duration_seconds_bucket{labels} {n}')
+        labels = _labels((('endpoint', endpoint),))
+        lines.append(f'ndc_api_request_duration_seconds_sum{labels} {histogram[-2]:.6f}')
+        lines.append(f'ndc_api_request_duration_seconds_count{labels} {histogram[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def profile_report(limit=40):
+    """
+    Return the accumulated profile of the sampled requests, sorted by cumulative time.
+    """
+    with _lock:
+        if _profile_stats is None:
+            return 'No requests have been profiled; set profile_rate above 0.\n'
+        out = io.StringIO()
+        stats = pstats.Stats(stream=out)
+        stats.add(_profile_stats)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+def reset():
+    """
+    Clear every recorded metric and profile.
+    """
+    global _profile_stats
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _durations.clear()
+        _profile_stats = None
@@ -0,0 +1,52 @@
+# Import required libraries
+import csv
+import os
+import re
+import numpy as np
+import pandas as pd
+import data_store
+
+# Optional two-column CSV (name,alias) mapping raw or cleaned names to a canonical name
+ALIASES_FILE = data_store.ALIASES_FILE
+
+_PARENTHETICAL = re.compile(r'\s*\(')
+
+
+def clean_name(name):
+    """
+    Clean a name by removing parenthetical information.
+    Example: 'Country (Region)' -> 'Country'
+    """
+    return _PARENTHETICAL.split(str(name))[0].strip()
+
+
+def load_aliases(path=None):
+    """
+    Read the alias table from a CSV file with 'name' and 'alias' columns.
+    Returns an empty dict when the file does not exist.
+    Example rows: 'Germany (BMU),Germany' or 'Germany,DEU' for an ISO3 mapping.
+    """
+    path = path or ALIASES_FILE
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['name'].strip(): row['alias'].strip() for row in csv.DictReader(f)}
+
+
+def normalize_names(values, aliases=None):
+    """
+    Normalize a Series of names, cleaning each distinct name only once.
+    The names are factorized into categorical codes, the categories are cleaned and
+    aliased, and the result is mapped back to the rows through the codes.
+    Aliases are looked up by raw name first, then by cleaned name; None loads ALIASES_FILE.
+    """
+    if aliases is None:
+        aliases = load_aliases()
+    categorical = pd.Categorical(values)
+    normalized = []
+    for name in categorical.categories:
+        cleaned = clean_name(name)
+        normalized.append(aliases.get(name, aliases.get(cleaned, cleaned)))
+    # Missing values have code -1, which picks the trailing entry ('nan', as str(NaN) gives)
+    lookup = np.array(normalized + [aliases.get('nan', 'nan')], dtype=object)
+    return pd.Series(lookup[categorical.codes], index=values.index, name=values.name)
@@ -50,67 +50,33 @@ function App() {
   ] = useState([]);
 
   useEffect(() => {
-    Promise.all([
-      fetch("/api/raw_data").then((r) => r.json()),
-      fetch("/api/deposited_column").then((r) => r.json()),
-      fetch("/api/by_contributor").then((r) => r.json()),
-      fetch("/api/by_contributor_math").then((r) => r.json()),
-      fetch("/api/by_contributor_clean").then((r) => r.json()),
-      fetch("/api/by_contributor_clean_math").then((r) => r.json()),
-      fetch("/api/sdg_count_by_country").then((r) => r.json()),
-      fetch("/api/by_country").then((r) => r.json()),
-      fetch("/api/by_country_math").then((r) => r.json()),
-      fetch("/api/by_country_clean").then((r) => r.json()),
-      fetch("/api/by_country_clean_math").then((r) => r.json()),
-      fetch("/api/ndc_status_table")
-        .then((r) => r.json())
-        .then(setNdcStatusTable),
-      fetch("/api/ndc_status_points_chart")
-        .then((r) => r.json())
-        .then(setNdcStatusPoints),
-      fetch("/api/deposited_by_ndc_status_countries")
-        .then((r) => r.json())
-        .then(setDepositedByNdcStatusCountries),
-      fetch("/api/ndc_status_points_chart_overlap")
-        .then((r) => r.json())
-        .then(setNdcStatusPointsOverlap),
-      fetch("/api/deposited_by_ndc_status_countries_overlap_order")
-        .then((r) => r.json())
-        .then(setDepositedByNdcStatusCountriesOverlapOrder),
-    ])
-      .then(
-        ([
-          rawData,
-          depositedColumn,
-          byContributor,
-          byContributorMath,
-          byContributorClean,
-          byContributorCleanMath,
-          sdgCountByCountry,
-          byCountry,
-          byCountryMath,
-          byCountryClean,
-          byCountryCleanMath,
-          ndcStatusTable,
-          ndcStatusPoints,
-          depositedByNdcStatusCountries,
-          ndcStatusPointsOverlap,
-          depositedByNdcStatusCountriesOverlapOrder,
-        ]) => {
-          setRawData(rawData);
-          setDepositedColumn(depositedColumn);
-          setByContributor(byContributor);
-          setByContributorMath(byContributorMath);
-          setByContributorClean(byContributorClean);
-          setByContributorCleanMath(byContributorCleanMath);
-          setSdgCountByCountry(sdgCountByCountry);
-          setByCountry(byCountry);
-          setByCountryMath(byCountryMath);
-          setByCountryClean(byCountryClean);
-          setByCountryCleanMath(byCountryCleanMath);
-          setLoading(false);
-        }
-      )
+    // One request returns every dataset, all computed from the same data version
+    fetch("/api/dashboard")
+      .then((r) => r.json())
+      .then((views) => {
+        if (views.error) throw new Error(views.error);
+        setRawData(views.raw_data);
+        setDepositedColumn(views.deposited_column);
+        setByContributor(views.by_contributor);
+        setByContributorMath(views.by_contributor_math);
+        setByContributorClean(views.by_contributor_clean);
+        setByContributorCleanMath(views.by_contributor_clean_math);
+        setSdgCountByCountry(views.sdg_count_by_country);
+        setByCountry(views.by_country);
+        setByCountryMath(views.by_country_math);
+        setByCountryClean(views.by_country_clean);
+        setByCountryCleanMath(views.by_country_clean_math);
+        setNdcStatusTable(views.ndc_status_table);
+        setNdcStatusPoints(views.ndc_status_points_chart);
+        setDepositedByNdcStatusCountries(
+          views.deposited_by_ndc_status_countries
+        );
+        setNdcStatusPointsOverlap(views.ndc_status_points_chart_overlap);
+        setDepositedByNdcStatusCountriesOverlapOrder(
+          views.deposited_by_ndc_status_countries_overlap_order
+        );
+        setLoading(false);
+      })
       .catch((err) => {
         setError(err.message);
         setLoading(false);
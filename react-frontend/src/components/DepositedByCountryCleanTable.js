@@ -1,4 +1,5 @@
 import React from "react";
+import GroupEntries from "./GroupEntries";
 
 function DepositedByCountryCleanTable({ data }) {
   if (!data || data.length === 0) return <p>No data available.</p>;
@@ -23,15 +24,15 @@ function DepositedByCountryCleanTable({ data }) {
           </tr>
         </thead>
         <tbody>
-          {data.map((row, i) => (
-            <tr key={i}>
+          {data.map((row) => (
+            <tr key={row["Country_clean"]}>
               <td style={{ padding: 4 }}>{row["Country_clean"]}</td>
-              <td style={{ padding: 4 }}>
-                {Array.isArray(row["Entries"])
-                  ? row["Entries"].join(", ")
-                  : row["Entries"]}
-              </td>
-              <td style={{ padding: 4 }}>{row["Sum Math"]}</td>
+              <GroupEntries
+                groupBy="Country"
+                normalize
+                name={row["Country_clean"]}
+                count={row["Count"]}
+              />
               <td style={{ padding: 4 }}>{row["Total"]}</td>
             </tr>
           ))}
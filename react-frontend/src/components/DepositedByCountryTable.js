@@ -1,4 +1,5 @@
 import React from "react";
+import GroupEntries from "./GroupEntries";
 
 function DepositedByCountryTable({ data }) {
   if (!data || data.length === 0) return <p>No data available.</p>;
@@ -21,15 +22,14 @@ function DepositedByCountryTable({ data }) {
           </tr>
         </thead>
         <tbody>
-          {data.map((row, i) => (
-            <tr key={i}>
+          {data.map((row) => (
+            <tr key={row["Country"]}>
               <td style={{ padding: 4 }}>{row["Country"]}</td>
-              <td style={{ padding: 4 }}>
-                {Array.isArray(row["Entries"])
-                  ? row["Entries"].join(", ")
-                  : row["Entries"]}
-              </td>
-              <td style={{ padding: 4 }}>{row["Sum Math"]}</td>
+              <GroupEntries
+                groupBy="Country"
+                name={row["Country"]}
+                count={row["Count"]}
+              />
               <td style={{ padding: 4 }}>{row["Total"]}</td>
             </tr>
           ))}
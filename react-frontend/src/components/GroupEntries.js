@@ -0,0 +1,71 @@
+import React, { useState } from "react";
+
+const PAGE_SIZE = 50;
+
+// Entries and Sum Math cells of one group, fetched from /api/aggregate/entries on demand
+export default function GroupEntries({ groupBy, normalize, name, count }) {
+  const [entries, setEntries] = useState(null);
+  const [sum, setSum] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState(null);
+
+  const load = (cursor) => {
+    const params = new URLSearchParams({
+      group_by: groupBy,
+      key: name,
+      limit: PAGE_SIZE,
+      cursor: cursor,
+    });
+    if (normalize) params.set("normalize", "1");
+    setLoading(true);
+    fetch(`/api/aggregate/entries?${params}`)
+      .then((res) => {
+        setNextCursor(res.headers.get("X-Next-Cursor"));
+        return res.json();
+      })
+      .then((group) => {
+        if (group.error) throw new Error(group.error);
+        setEntries((previous) => (previous || []).concat(group["Entries"]));
+        setSum(group["Total"]);
+      })
+      .catch((err) => setError(err.message))
+      .finally(() => setLoading(false));
+  };
+
+  if (error) {
+    return (
+      <td colSpan={2} style={{ padding: 4, color: "red" }}>
+        Error: {error}
+      </td>
+    );
+  }
+  if (entries === null) {
+    return (
+      <td colSpan={2} style={{ padding: 4 }}>
+        <button onClick={() => load(0)} disabled={loading}>
+          {loading ? "Loading..." : `Show ${count} entries`}
+        </button>
+      </td>
+    );
+  }
+  return (
+    <>
+      <td style={{ padding: 4 }}>
+        {entries.join(", ")}
+        {nextCursor && (
+          <button
+            onClick={() => load(nextCursor)}
+            disabled={loading}
+            style={{ marginLeft: 4 }}>
+            {loading ? "Loading..." : "More"}
+          </button>
+        )}
+      </td>
+      <td style={{ padding: 4 }}>
+        {entries.join(" + ")}
+        {nextCursor ? " + ..." : ""} = {sum}
+      </td>
+    </>
+  );
+}
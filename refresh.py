@@ -0,0 +1,172 @@
+# Import required libraries
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+import data_store
+
+# Build every dataset and view before the server starts accepting requests
+WARM_UP = os.environ.get('API_WARM_UP', '0') == '1'
+# Seconds between checks of Data/ by the background watcher (0 disables it)
+WATCH_INTERVAL = float(os.environ.get('DATA_WATCH_INTERVAL', '0'))
+# Versions kept in the snapshot history by the ingests the server runs
+KEEP_VERSIONS = int(os.environ.get('DATA_KEEP_VERSIONS', '10'))
+
+logger = logging.getLogger(__name__)
+
+# Published state, replaced as one reference after each successful build:
+# 'snapshot' is the ingested version requests read (None: read the files in Data/ directly),
+# 'version' the dataset version its views are materialized under
+_state = {
+    'ready': True,
+    'snapshot': None,
+    'version': None,
+    'built_at': None,
+    'build_seconds': None,
+    # Newest modification time of the sources the published version was built from
+    'last_modified': None,
+    'last_error': None,
+    'watching': False,
+}
+# The (snapshot, version) a rebuild is warming, visible only to the thread building it
+_local = threading.local()
+_build_lock = threading.Lock()
+
+
+def _publish(**changes):
+    """
+    Swap in a new state with `changes` applied.
+    """
+    global _state
+    _state = dict(_state, **changes)
+
+
+def serving():
+    """
+    Return the (snapshot, version) pair requests should read, or None to read Data/ directly.
+    While a rebuild runs, its own thread sees the version being built; every other thread
+    keeps the published one until the build is complete. Without the watcher to swap in
+    new data, the published version is only served while the files still match it.
+    """
+    building = getattr(_local, 'building', None)
+    if building is not None:
+        return building
+    state = _state
+    if state['snapshot'] is None:
+        return None
+    if not state['watching'] and data_store.dataset_version() != state['version']:
+        return None
+    return state['snapshot'], state['version']
+
+
+def current_version():
+    """
+    Return the dataset version being served: the published one, or the live files' version.
+    """
+    served = serving()
+    return served[1] if served else data_store.dataset_version()
+
+
+def status():
+    """
+    Return the published state for the readiness and health endpoints.
+    """
+    state = dict(_state)
+    state['version'] = current_version()
+    return state
+
+
+def _snapshot_version():
+    """
+    Return the ingested version matching the files in Data/, running ingest.py when the
+    snapshot is missing or stale.
+    """
+    manifest = data_store.read_manifest()
+    if not data_store.manifest_is_current(manifest):
+        import ingest
+        manifest = ingest.build_snapshot(keep=KEEP_VERSIONS, if_stale=True)
+    return manifest['version']
+
+
+def rebuild(warm):
+    """
+    Rebuild the snapshot from Data/ and run `warm()` to materialize the views for it,
+    then publish the new version. Requests keep reading the previous one until then.
+    Without pyarrow there is no snapshot to swap in, and the views are warmed in place.
+    """
+    with _build_lock:
+        start = time.perf_counter()
+        last_modified = data_store.last_modified()
+        version = data_store.dataset_version()
+        snapshot = _snapshot_version() if data_store.feather is not None else None
+        _local.building = (snapshot, version) if snapshot is not None else None
+        try:
+            warm()
+        finally:
+            _local.building = None
+        _publish(
+            ready=True,
+            snapshot=snapshot,
+            version=version,
+            built_at=datetime.now(timezone.utc).isoformat(),
+            build_seconds=round(time.perf_counter() - start, 3),
+            last_modified=last_modified,
+            last_error=None,
+        )
+        return version
+
+
+def warm_up(warm):
+    """
+    Build and publish the current data before serving; readiness reports 503 until it is done.
+    """
+    _publish(ready=False)
+    try:
+        return rebuild(warm)
+    except Exception as e:
+        # Serve anyway: requests fall back to building on demand and report their own errors
+        logger.exception('Warm-up failed')
+        _publish(ready=True, last_error=str(e))
+
+
+def _watch(warm, interval):
+    """
+    Poll the dataset version and rebuild whenever a file in Data/ changes.
+    """
+    seen = _state['version']
+    while True:
+        time.sleep(interval)
+        try:
+            version = data_store.dataset_version()
+            if version == seen:
+                continue
+            seen = version
+            rebuild(warm)
+        except Exception as e:
+            # Keep serving the last good version; a later change triggers another attempt
+            logger.exception('Rebuild failed')
+            _publish(last_error=str(e))
+
+
+def start_watcher(warm, interval=None):
+    """
+    Start the background thread that rebuilds and swaps in new data when Data/ changes.
+    Returns the thread, or None when the interval is 0.
+    """
+    interval = WATCH_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return None
+    thread = threading.Thread(target=_watch, args=(warm, interval), name='data-watcher', daemon=True)
+    thread.start()
+    _publish(watching=True)
+    return thread
+
+
+def start(warm, warm_up_first=None, interval=None):
+    """
+    Apply the WARM_UP and WATCH_INTERVAL settings (or the given overrides) for a server process.
+    """
+    if WARM_UP if warm_up_first is None else warm_up_first:
+        warm_up(warm)
+    return start_watcher(warm, interval)
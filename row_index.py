@@ -0,0 +1,134 @@
+# Import required libraries
+import numpy as np
+from aggregates import DEPOSITED
+
+# Columns with an equality index, keyed by the query parameter that filters on them
+EQUALITY_FILTERS = {
+    'country': 'Country',
+    'contributor': 'Contributor',
+}
+
+
+def build_row_index(df):
+    """
+    Build the lookup structures used to filter, sort and page the pledge rows.
+    Equality columns map each value to its sorted row positions; the deposited
+    amount is kept sorted so range filters are two binary searches.
+    """
+    index = {'frame': df, 'equality': {}}
+    for column in EQUALITY_FILTERS.values():
+        index['equality'][column] = {
+            value: np.asarray(positions) for value, positions in df.groupby(column, sort=False).indices.items()
+        }
+    deposited = df[DEPOSITED].to_numpy(dtype=float)
+    present = np.flatnonzero(~np.isnan(deposited))
+    order = present[np.argsort(deposited[present], kind='stable')]
+    index['deposited_order'] = order
+    index['deposited_sorted'] = deposited[order]
+    return index
+
+
+def _parse_float(name, value):
+    """
+    Parse a numeric query parameter, raising ValueError with the parameter name.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+
+
+def _parse_int(name, value, minimum):
+    """
+    Parse an integer query parameter no smaller than `minimum`.
+    """
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+    if number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return number
+
+
+def match_rows(index, filters):
+    """
+    Return the sorted row positions matching the filters.
+    `filters` maps 'country' / 'contributor' to a list of accepted values and may hold
+    'min_deposited' / 'max_deposited' bounds (inclusive). Returns None when nothing is filtered.
+    """
+    positions = None
+    for param, column in EQUALITY_FILTERS.items():
+        values = filters.get(param)
+        if not values:
+            continue
+        lookup = index['equality'][column]
+        matched = [lookup[v] for v in values if v in lookup]
+        matched = np.unique(np.concatenate(matched)) if matched else np.empty(0, dtype=np.intp)
+        positions = matched if positions is None else np.intersect1d(positions, matched, assume_unique=True)
+    low = filters.get('min_deposited')
+    high = filters.get('max_deposited')
+    if low is not None or high is not None:
+        sorted_values = index['deposited_sorted']
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side='left')
+        stop = len(sorted_values) if high is None else np.searchsorted(sorted_values, high, side='right')
+        matched = np.sort(index['deposited_order'][start:stop])
+        positions = matched if positions is None else np.intersect1d(positions, matched, assume_unique=True)
+    return positions
+
+
+def select_rows(index, args):
+    """
+    Apply the filter, projection and sort parameters of a raw-data query.
+    `args` is a request's query parameters (a MultiDict): columns, sort, country,
+    contributor, min_deposited and max_deposited.
+    Returns (ordered row positions, column names). Raises ValueError for invalid parameters.
+    """
+    df = index['frame']
+    filters = {param: args.getlist(param) for param in EQUALITY_FILTERS}
+    for name in ('min_deposited', 'max_deposited'):
+        if args.get(name) is not None:
+            filters[name] = _parse_float(name, args.get(name))
+    positions = match_rows(index, filters)
+    if positions is None:
+        positions = np.arange(len(df))
+
+    columns = list(df.columns)
+    if args.get('columns'):
+        columns = [col.strip() for col in args.get('columns').split(',')]
+        missing = [col for col in columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"Unknown columns: {', '.join(missing)}")
+
+    sort = args.get('sort')
+    if sort:
+        descending = sort.startswith('-')
+        sort_column = sort.lstrip('-')
+        if sort_column not in df.columns:
+            raise ValueError(f"Unknown sort column: {sort_column}")
+        values = df[sort_column].iloc[positions].reset_index(drop=True)
+        order = values.sort_values(ascending=not descending, kind='stable', na_position='last').index
+        positions = positions[order.to_numpy()]
+    return positions, columns
+
+
+def query_rows(index, args):
+    """
+    Run a raw-data query against the row index.
+    Takes the select_rows parameters plus limit and cursor for paging.
+    Returns (DataFrame page, total matching rows, next cursor or None).
+    Raises ValueError for invalid parameters.
+    """
+    positions, columns = select_rows(index, args)
+    total = len(positions)
+    start = _parse_int('cursor', args.get('cursor', 0), 0)
+    next_cursor = None
+    if args.get('limit') is not None:
+        limit = _parse_int('limit', args.get('limit'), 1)
+        stop = start + limit
+        if stop < total:
+            next_cursor = str(stop)
+        positions = positions[start:stop]
+    else:
+        positions = positions[start:]
+    return index['frame'].iloc[positions][columns], total, next_cursor
@@ -0,0 +1,160 @@
+# Import required libraries
+import os
+import numpy as np
+import pandas as pd
+import data_store
+import metrics
+import normalize
+from aggregates import DEPOSITED
+
+# Accepted header names (compared case-insensitively) for the columns the index needs
+COUNTRY_COLUMNS = ('Country', 'Country Name', 'Party')
+SDG_COLUMNS = ('SDG', 'Goal', 'SDG Goal', 'Target', 'SDG Target')
+# Rows parsed per chunk; the linkage file has one row per country x target x indicator
+CHUNK_ROWS = 100000
+SDG_GOALS = range(1, 18)
+
+
+def _find_column(columns, candidates):
+    """
+    Return the first header matching one of the candidate names, or None.
+    """
+    by_name = {col.strip().lower(): col for col in columns}
+    for name in candidates:
+        if name.lower() in by_name:
+            return by_name[name.lower()]
+    return None
+
+
+def validate_schema(path):
+    """
+    Read the header of the linkage CSV and return its (country column, SDG column).
+    Raises FileNotFoundError when the file is missing and ValueError when a column cannot be found.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"SDG linkage file not found: {path}. Download the WRI NDC-SDG linkages "
+            f"(see Data/sources.csv) and save them as {os.path.basename(path)}"
+        )
+    columns = list(pd.read_csv(path, nrows=0).columns)
+    country_col = _find_column(columns, COUNTRY_COLUMNS)
+    sdg_col = _find_column(columns, SDG_COLUMNS)
+    if country_col is None or sdg_col is None:
+        raise ValueError(
+            f"{os.path.basename(path)} needs a country column (one of {', '.join(COUNTRY_COLUMNS)}) "
+            f"and an SDG column (one of {', '.join(SDG_COLUMNS)}); found {', '.join(columns)}"
+        )
+    return country_col, sdg_col
+
+
+def goal_numbers(values):
+    """
+    Parse SDG goal numbers from values such as '7', 'SDG 7', 'Goal 7: Energy' or target '7.2'.
+    Returns a float Series with NaN where no goal between 1 and 17 is found.
+    """
+    goals = pd.to_numeric(values.astype(str).str.extract(r'(\d+)', expand=False), errors='coerce')
+    return goals.where(goals.between(SDG_GOALS.start, SDG_GOALS.stop - 1))
+
+
+def build_sdg_index(path=None, chunk_rows=None):
+    """
+    Stream the linkage CSV in chunks and build a country -> SDG bitset index.
+    Bit g - 1 of a country's mask is set when any of its rows links to goal g.
+    Returns a dict with 'countries' (sorted names), 'masks' (uint32, one per country),
+    'rows' (rows read) and 'skipped' (rows without a country or a valid goal).
+    """
+    path = path or data_store.SDG_LINKAGES_FILE
+    country_col, sdg_col = validate_schema(path)
+    partial = []
+    rows = skipped = 0
+    with metrics.stage('build:sdg_index'):
+        chunks = pd.read_csv(path, usecols=[country_col, sdg_col], dtype=str,
+                             chunksize=chunk_rows or CHUNK_ROWS)
+        for chunk in chunks:
+            rows += len(chunk)
+            goals = goal_numbers(chunk[sdg_col])
+            valid = goals.notna() & chunk[country_col].notna()
+            skipped += int((~valid).sum())
+            masks = np.left_shift(np.uint32(1), (goals[valid] - 1).astype(np.uint32).to_numpy())
+            countries = chunk.loc[valid, country_col].str.strip().to_numpy()
+            partial.append(pd.Series(masks, index=countries).groupby(level=0).agg(np.bitwise_or.reduce))
+    metrics.count('rows_loaded_total', rows)
+    if partial:
+        combined = pd.concat(partial)
+        combined = combined.groupby(level=0).agg(np.bitwise_or.reduce)
+    else:
+        combined = pd.Series([], dtype=np.uint32)
+    return {
+        'countries': combined.index.to_numpy(dtype=object),
+        'masks': combined.to_numpy(dtype=np.uint32),
+        'rows': rows,
+        'skipped': skipped,
+    }
+
+
+def goal_counts(masks):
+    """
+    Return the number of SDGs set in each mask.
+    """
+    return np.unpackbits(masks.astype('<u4').view(np.uint8).reshape(-1, 4), axis=1).sum(axis=1)
+
+
+def sdg_counts(index):
+    """
+    Number of SDGs linked to each country, sorted ascending.
+    Returns a {Country, SDG_Count} DataFrame.
+    """
+    counts = pd.DataFrame({'Country': index['countries'], 'SDG_Count': goal_counts(index['masks'])})
+    return counts.sort_values('SDG_Count', ascending=True)
+
+
+def countries_for_goal(index, goal):
+    """
+    Return the countries linked to SDG `goal` (1-17), in name order.
+    """
+    if goal not in SDG_GOALS:
+        raise ValueError(f"goal must be between {SDG_GOALS.start} and {SDG_GOALS.stop - 1}")
+    linked = (index['masks'] & np.uint32(1 << (goal - 1))) != 0
+    return index['countries'][linked].tolist()
+
+
+def _clean_masks(index, aliases=None):
+    """
+    Return the SDG masks keyed by cleaned country name (see normalize.normalize_names).
+    Several raw names can clean to one country; their goals are combined.
+    """
+    names = normalize.normalize_names(pd.Series(index['countries'], dtype=object), aliases)
+    return pd.Series(index['masks'], index=names.to_numpy()).groupby(level=0).agg(np.bitwise_or.reduce)
+
+
+def finance_by_country(index, deposited_totals, aliases=None):
+    """
+    Join the SDG counts with the deposited totals by cleaned country name.
+    `deposited_totals` is a Series of totals indexed by cleaned country name.
+    Returns a {Country, SDG_Count, Deposited} DataFrame of the countries in both, sorted by deposits.
+    """
+    masks = _clean_masks(index, aliases)
+    joined = pd.DataFrame({'Country': masks.index, 'SDG_Count': goal_counts(masks.to_numpy())})
+    joined[DEPOSITED] = joined['Country'].map(deposited_totals)
+    joined = joined[joined[DEPOSITED].notna()]
+    return joined.sort_values(DEPOSITED, ascending=True)
+
+
+def finance_by_goal(index, deposited_totals, aliases=None):
+    """
+    For each SDG, the number of linked countries and the total deposited to those
+    that have finance rows. Returns a {SDG, Countries, Funded_Countries, Deposited} DataFrame.
+    """
+    masks = _clean_masks(index, aliases)
+    deposited = masks.index.map(deposited_totals).to_numpy(dtype=float)
+    funded = ~np.isnan(deposited)
+    rows = []
+    for goal in SDG_GOALS:
+        linked = (masks.to_numpy() & np.uint32(1 << (goal - 1))) != 0
+        rows.append({
+            'SDG': goal,
+            'Countries': int(linked.sum()),
+            'Funded_Countries': int((linked & funded).sum()),
+            DEPOSITED: float(deposited[linked & funded].sum()),
+        })
+    return pd.DataFrame(rows)
@@ -1,7 +1,11 @@
-import streamlit as st
+import io
 import pandas as pd
-import matplotlib.pyplot as plt
-import re
+import streamlit as st
+from matplotlib.figure import Figure
+import aggregates
+import data_store
+import dataset
+import group_index
 
 # Removed custom CSS block for dark background
 st.markdown(
@@ -34,78 +38,102 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+# Reruns reuse the API's per-version data layer; everything below is cached by dataset version
+@st.cache_resource(max_entries=aggregates.MAX_VERSIONS)
+def pledge_groups(version):
+    """
+    Return the pledge group index for a dataset version, shared with the APIs.
+    """
+    return dataset.pledge_groups()
+
+
+@st.cache_data(max_entries=4 * aggregates.MAX_VERSIONS)
+def group_table(version, normalized, entries):
+    """
+    Deposited totals by contributor (cleaned when `normalized`) as a DataFrame.
+    With `entries`, in key order with each contributor's entries and Sum Math (up to
+    group_index.MAX_ENTRIES per contributor), otherwise sorted by total ascending.
+    """
+    index = pledge_groups(version)
+    args = {'group_by': 'Contributor', 'normalize': '1' if normalized else '0'}
+    if entries:
+        args.update(entries='1', sort='key')
+    return pd.DataFrame(group_index.aggregate(index, group_index.parse_query(index, args)))
+
+
+def _png(fig):
+    """
+    Render a figure to PNG bytes.
+    """
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    return buffer.getvalue()
+
+
+@st.cache_data(max_entries=aggregates.MAX_VERSIONS)
+def histogram_png(version):
+    """
+    The distribution of the deposited amounts, rendered once per dataset version.
+    """
+    deposited = dataset.load_data()[aggregates.DEPOSITED]
+    fig = Figure()
+    ax = fig.subplots()
+    ax.hist(deposited.dropna(), bins=20, color='skyblue', edgecolor='black')
+    ax.set_xlabel(aggregates.DEPOSITED)
+    ax.set_ylabel('Frequency')
+    ax.set_title(f'Distribution of {aggregates.DEPOSITED}')
+    return _png(fig)
+
+
+@st.cache_data(max_entries=2 * aggregates.MAX_VERSIONS)
+def totals_png(version, normalized):
+    """
+    The bar chart of deposited totals by contributor, rendered once per dataset version.
+    """
+    totals = group_table(version, normalized, False)
+    key = 'Contributor_clean' if normalized else 'Contributor'
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.bar(totals[key], totals[aggregates.DEPOSITED], color='seagreen')
+    ax.set_xlabel('Contributor')
+    ax.set_ylabel(f'Total {aggregates.DEPOSITED}')
+    ax.set_title(f'Total {aggregates.DEPOSITED} by Contributor' + (' (cleaned)' if normalized else ''))
+    ax.tick_params(axis='x', labelrotation=90, labelsize=8)
+    return _png(fig)
+
+
 st.title("Deposited (USD million current) Analysis")
 
 # --- Load Data ---
-finance_data = pd.read_excel('Data/CFU-Website-MASTER-Update-for-2025.xlsx', sheet_name='Pledges')
-finance_data.columns = finance_data.columns.str.strip()
+# The dataset version changes whenever a file in Data/ does, which invalidates every cache above
+version = data_store.dataset_version()
+finance_data = dataset.load_data()
 st.subheader("All Deposited (USD million current) Data")
 st.dataframe(finance_data)
 
-# --- Create new DataFrame with just the Deposited (USD million current) column ---
-if 'Deposited (USD million current)' in finance_data.columns:
-    deposited_df = finance_data[['Deposited (USD million current)']].copy()
+# --- Show just the Deposited (USD million current) column ---
+if aggregates.DEPOSITED in finance_data.columns:
     st.subheader("Deposited (USD million current) Data")
-    st.write(deposited_df)
+    st.write(finance_data[[aggregates.DEPOSITED]])
 
     # --- Plot ---
     st.subheader("Distribution of Deposited (USD million current)")
-    fig, ax = plt.subplots()
-    ax.hist(deposited_df['Deposited (USD million current)'].dropna(), bins=20, color='skyblue', edgecolor='black')
-    ax.set_xlabel('Deposited (USD million current)')
-    ax.set_ylabel('Frequency')
-    ax.set_title('Distribution of Deposited (USD million current)')
-    st.pyplot(fig)
+    st.image(histogram_png(version))
 
     # --- Plot: Total Deposited (USD million current) by Contributor ---
     st.subheader("Total Deposited (USD million current) by Contributor")
-    contributor_deposit = finance_data.groupby('Contributor', as_index=False)['Deposited (USD million current)'].sum()
-    contributor_deposit = contributor_deposit.sort_values('Deposited (USD million current)', ascending=True)
-    fig_contributor, ax_contributor = plt.subplots(figsize=(12, 6))
-    ax_contributor.bar(contributor_deposit['Contributor'], contributor_deposit['Deposited (USD million current)'], color='seagreen')
-    ax_contributor.set_xlabel('Contributor')
-    ax_contributor.set_ylabel('Total Deposited (USD million current)')
-    ax_contributor.set_title('Total Deposited (USD million current) by Contributor')
-    plt.xticks(rotation=90, fontsize=8)
-    st.pyplot(fig_contributor)
+    st.image(totals_png(version, False))
 
     # --- Table: Total Deposited (USD million current) by Contributor (with math) ---
-    contributor_deposit_details = finance_data.groupby('Contributor')['Deposited (USD million current)'].agg(
-        Total='sum',
-        Entries=lambda x: list(x)
-    ).reset_index()
-    contributor_deposit_details['Sum Math'] = contributor_deposit_details['Entries'].apply(
-        lambda x: ' + '.join([str(v) for v in x]) + f' = {sum(x)}'
-    )
     st.subheader("Table: Total Deposited (USD million current) by Contributor (with math)")
-    st.dataframe(contributor_deposit_details[['Contributor', 'Entries', 'Sum Math', 'Total']])
+    st.dataframe(group_table(version, False, True)[['Contributor', 'Entries', 'Sum Math', 'Total']])
 else:
     st.error("Column 'Deposited (USD million current)' not found in the data. Please check the column name.")
 
-def clean_contributor(name):
-    return re.split(r'\s*\(', str(name))[0].strip()
-
-finance_data['Contributor_clean'] = finance_data['Contributor'].apply(clean_contributor)
-
 # --- Plot: Total Deposited (USD million current) by Contributor (cleaned) ---
 st.subheader("Total Deposited (USD million current) by Contributor (cleaned)")
-contributor_deposit = finance_data.groupby('Contributor_clean', as_index=False)['Deposited (USD million current)'].sum()
-contributor_deposit = contributor_deposit.sort_values('Deposited (USD million current)', ascending=True)
-fig_contributor, ax_contributor = plt.subplots(figsize=(12, 6))
-ax_contributor.bar(contributor_deposit['Contributor_clean'], contributor_deposit['Deposited (USD million current)'], color='seagreen')
-ax_contributor.set_xlabel('Contributor')
-ax_contributor.set_ylabel('Total Deposited (USD million current)')
-ax_contributor.set_title('Total Deposited (USD million current) by Contributor (cleaned)')
-plt.xticks(rotation=90, fontsize=8)
-st.pyplot(fig_contributor)
+st.image(totals_png(version, True))
 
 # --- Table: Total Deposited (USD million current) by Contributor (with math, cleaned) ---
-contributor_deposit_details = finance_data.groupby('Contributor_clean')['Deposited (USD million current)'].agg(
-    Total='sum',
-    Entries=lambda x: list(x)
-).reset_index()
-contributor_deposit_details['Sum Math'] = contributor_deposit_details['Entries'].apply(
-    lambda x: ' + '.join([str(v) for v in x]) + f' = {sum(x)}'
-)
 st.subheader("Table: Total Deposited (USD million current) by Contributor (with math, cleaned)")
-st.dataframe(contributor_deposit_details[['Contributor_clean', 'Entries', 'Sum Math', 'Total']]) 
\ No newline at end of file
+st.dataframe(group_table(version, True, True)[['Contributor_clean', 'Entries', 'Sum Math', 'Total']])
@@ -1,27 +1,46 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse
-import pandas as pd
-import re
+import os
+import sys
 
-app = FastAPI()
+# Share the data layer used by flask_app.py and streamlit_app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dataset
+import group_index
+import refresh
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up (API_WARM_UP=1) and start the Data/ watcher (DATA_WATCH_INTERVAL) before serving
+    await run_in_threadpool(refresh.start, dataset.warm_views)
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 def get_contributor_data():
-    finance_data = pd.read_excel('Data/CFU-Website-MASTER-Update-for-2025.xlsx', sheet_name='Pledges')
-    finance_data.columns = finance_data.columns.str.strip()
-    def clean_contributor(name):
-        return str(name).split('(')[0].strip()
-    finance_data['Contributor_clean'] = finance_data['Contributor'].apply(clean_contributor)
-    contributor_deposit = finance_data.groupby('Contributor_clean', as_index=False)['Deposited (USD million current)'].sum()
-    contributor_deposit = contributor_deposit.sort_values('Deposited (USD million current)', ascending=True)
-    return contributor_deposit
+    index = dataset.pledge_groups()
+    query = group_index.parse_query(index, {'group_by': 'Contributor', 'normalize': '1'})
+    return group_index.aggregate(index, query)
 
 @app.get("/api/contributors")
-def contributors():
-    df = get_contributor_data()
-    return JSONResponse(df.to_dict(orient="records"))
+async def contributors():
+    # Loading may parse the workbook, so keep it off the event loop
+    records = await run_in_threadpool(get_contributor_data)
+    return JSONResponse(records)
+
+@app.get("/api/_health")
+def health():
+    return refresh.status()
+
+@app.get("/api/_ready")
+def ready():
+    state = refresh.status()
+    return JSONResponse(state, status_code=200 if state['ready'] else 503)
 
 @app.get("/")
 def root():